@@ -1,20 +1,579 @@
 import sys
-import subprocess
 import os
-import time
 import json
+import socket
+
+
+# 瘦客户端只依赖以上几个模块：放在其余导入之前，Client 命令无需加载完整的评测工具即可转发请求
+def CacheBase():
+    """持久缓存的根目录：$OITOOLS_CACHE 或 ~/.cache/oitools"""
+    return os.environ.get("OITOOLS_CACHE") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "oitools")
+
+
+def RunClient(Argv, SocketPath=None):
+    """瘦客户端：把命令转发给守护进程并原样输出结果，返回退出码"""
+    if not Argv:
+        print("用法: python3 OITools.py Client [命令] [参数...]（Client Stop 退出守护进程）")
+        return 1
+    SocketPath = SocketPath or os.environ.get("OITOOLS_SOCKET") or os.path.join(CacheBase(), "daemon", "daemon.sock")
+    Sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        Sock.connect(SocketPath)
+    except OSError:
+        print("❌ 守护进程未运行，请先执行: python3 OITools.py Daemon")
+        return 1
+    # 只有 Run 会读取标准输入，其余命令不转发以免等待不会关闭的管道
+    Stdin = ""
+    if Argv[0] == "Run" and "-i" not in Argv and "--input" not in Argv and not sys.stdin.isatty():
+        Stdin = sys.stdin.read()
+    Request = {"argv": Argv, "cwd": os.getcwd(), "session": os.getppid(), "stdin": Stdin}
+    Code = 1
+    with Sock, Sock.makefile("rw", encoding="utf-8") as Channel:
+        Channel.write(json.dumps(Request, ensure_ascii=False) + "\n")
+        Channel.flush()
+        for Line in Channel:
+            Message = json.loads(Line)
+            if "out" in Message:
+                sys.stdout.write(Message["out"])
+                sys.stdout.flush()
+            if "exit" in Message:
+                Code = Message["exit"]
+                break
+    return Code
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ["Client"]:
+    sys.exit(RunClient(sys.argv[2:]))
+
+import subprocess
+import time
 import re
 import resource
 import signal
 import threading
+import tempfile
+import shutil
+import queue
+import argparse
+import hashlib
+import fcntl
+import select
+import itertools
+import statistics
+import math
+import struct
+import ctypes
+import sqlite3
+import io
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 
+# 流式比较时每次读取的块大小
+CompareChunkSize = 1 << 20
+# 评测记录中保留的标准错误长度（字符）
+StderrExcerptSize = 1024
+# 未指定 -j 且配置中没有"并行测试"时并行运行的样例数，0表示使用全部CPU
+DefaultWorkers = 1
+# 结果缓存的容量：通过记录与文件哈希各保留最近使用的条数，每天至多清理一次
+ResultCacheLimit = 200000
+ResultCachePruneInterval = 86400
+# 源文件没有配置（或缺少某项）时使用的默认配置
+DefaultConfig = {"C++版本": "C++17", "优化等级": "-O2", "时间限制": 2000, "内存限制": 256}
+# 行末空白（与 str.rstrip 一致的 ASCII 空白字符）
+TrailingSpacePattern = re.compile(rb"[ \t\r\f\v\x1c-\x1f]+\n")
+TrailingSpaceMarkers = (b" \n", b"\t\n", b"\r\n")
+RareSpaceChars = (b"\f", b"\v", b"\x1c", b"\x1d", b"\x1e", b"\x1f")
+
+# ioctl(FICLONE)：在支持的文件系统（btrfs/xfs）上创建共享数据块的reflink副本
+FICLONE = 0x40049409
+
+# 复杂度估计的候选曲线
+ComplexityModels = [
+    ("O(1)", lambda N: 1.0),
+    ("O(log n)", lambda N: math.log2(N)),
+    ("O(√n)", lambda N: math.sqrt(N)),
+    ("O(n)", lambda N: float(N)),
+    ("O(n log n)", lambda N: N * math.log2(N)),
+    ("O(n log² n)", lambda N: N * math.log2(N) ** 2),
+    ("O(n√n)", lambda N: N ** 1.5),
+    ("O(n²)", lambda N: float(N) ** 2),
+    ("O(n² log n)", lambda N: float(N) ** 2 * math.log2(N)),
+    ("O(n³)", lambda N: float(N) ** 3),
+    ("O(2ⁿ)", lambda N: 2.0 ** min(N, 1000)),
+]
+# 复杂度拟合的噪声下限：相对波动至少为 ComplexityNoise（内存受页与分配器粒度影响，取得更宽），
+# 各规模间的变化不超过 ComplexityFlat（时间ms，内存MB）时视为 O(1)
+ComplexityNoise = {"时间": 0.02, "内存": 0.05}
+ComplexityFlat = {"时间": 0.5, "内存": 0.25}
+
+# 运行器源码：由 Python 直接 fork 时子进程会继承解释器的内存占用，ru_maxrss 偏大，
+# 因此由这个很小的进程负责 fork/exec 被测程序并通过 wait4 汇报精确的资源统计
+RunnerSource = r'''// OITools 运行器：在极小的进程中 fork 出被测程序，设置资源限制与重定向，
+// 通过 wait4 获取内核统计的精确 CPU 时间与峰值内存，并以一行 key=value 输出到标准输出；
+// 以 -S 启动时作为常驻服务，从标准输入逐个读取运行请求（参数个数与每个参数均以 "长度\n内容" 编码），
+// 每个请求的结果后跟一个空行
+#define _GNU_SOURCE
+#include <errno.h>
+#include <fcntl.h>
+#include <linux/perf_event.h>
+#include <sched.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/prctl.h>
+#include <sys/resource.h>
+#include <sys/syscall.h>
+#include <sys/time.h>
+#include <sys/wait.h>
+#include <time.h>
+#include <unistd.h>
+
+static pid_t Child = -1;
+static volatile sig_atomic_t TimedOut = 0;
+
+static void OnAlarm(int Sig) {
+    (void)Sig;
+    TimedOut = 1;
+    if (Child > 0) kill(Child, SIGKILL);
+}
+
+static void OnTerm(int Sig) {
+    if (Child > 0) kill(Child, SIGKILL);
+    signal(Sig, SIG_DFL);
+    raise(Sig);
+}
+
+// 硬件计数器：指令数、周期数、缓存未命中、分支未命中
+static const unsigned long long CounterConfigs[4] = {
+    PERF_COUNT_HW_INSTRUCTIONS, PERF_COUNT_HW_CPU_CYCLES,
+    PERF_COUNT_HW_CACHE_MISSES, PERF_COUNT_HW_BRANCH_MISSES,
+};
+
+static int OpenCounter(pid_t Pid, unsigned long long Config) {
+    struct perf_event_attr A;
+    memset(&A, 0, sizeof(A));
+    A.size = sizeof(A);
+    A.type = PERF_TYPE_HARDWARE;
+    A.config = Config;
+    A.disabled = 1;
+    A.enable_on_exec = 1;
+    A.inherit = 1;
+    A.exclude_kernel = 1;
+    A.exclude_hv = 1;
+    A.read_format = PERF_FORMAT_TOTAL_TIME_ENABLED | PERF_FORMAT_TOTAL_TIME_RUNNING;
+    return (int)syscall(SYS_perf_event_open, &A, Pid, -1, -1, PERF_FLAG_FD_CLOEXEC);
+}
+
+// 读取计数器，计数器被复用（multiplexing）时按运行时间比例换算，不可用时返回 -1
+static long long ReadCounter(int Fd) {
+    unsigned long long V[3];
+    if (Fd < 0 || read(Fd, V, sizeof(V)) != sizeof(V) || V[2] == 0) return -1;
+    return (long long)((double)V[0] * V[1] / V[2]);
+}
+
+static int Redirect(const char *Path, int Fd, int Flags) {
+    int F;
+    if (!Path) return 0;
+    F = open(Path, Flags, 0644);
+    if (F < 0) return -1;
+    if (F != Fd) {
+        if (dup2(F, Fd) < 0) return -1;
+        close(F);
+    }
+    return 0;
+}
+
+static int RunOnce(int argc, char **argv) {
+    long long TimeMs = 0, WallMs = 0, Mem = 0;
+    int Cpu = -1, Opt, Sync[2], Go[2], ExecErr = 0, Status = 0, Perf = 0, Counters[4], I;
+    const char *In = "/dev/null", *Out = "/dev/null", *Err = NULL, *Cgroup = NULL, *Dir = NULL;
+    struct timespec Start, End;
+    struct itimerval Timer;
+    struct rusage Ru;
+    ssize_t N;
+
+    // optind 为 0 时 glibc 重新初始化 getopt，服务模式下每个请求都重新解析
+    optind = 0;
+    TimedOut = 0;
+    while ((Opt = getopt(argc, argv, "+t:w:m:c:i:o:e:g:d:p")) != -1) {
+        switch (Opt) {
+            case 't': TimeMs = atoll(optarg); break;
+            case 'w': WallMs = atoll(optarg); break;
+            case 'm': Mem = atoll(optarg); break;
+            case 'c': Cpu = atoi(optarg); break;
+            case 'i': In = optarg; break;
+            case 'o': Out = optarg; break;
+            case 'e': Err = optarg; break;
+            case 'g': Cgroup = optarg; break;
+            case 'd': Dir = optarg; break;
+            case 'p': Perf = 1; break;
+            default: return 2;
+        }
+    }
+    if (optind >= argc || pipe2(Sync, O_CLOEXEC) < 0) return 2;
+    if (pipe2(Go, O_CLOEXEC) < 0) {
+        close(Sync[0]);
+        close(Sync[1]);
+        return 2;
+    }
+
+    clock_gettime(CLOCK_MONOTONIC, &Start);
+    // 子进程在 exec 前只做系统调用，不需要挂计数器时用 vfork 省去复制页表的开销；
+    // 计数器需要父进程在子进程 exec 前打开，只能用 fork 并等待 Go 管道
+    Child = Perf ? fork() : vfork();
+    if (Child < 0) {
+        close(Sync[0]);
+        close(Sync[1]);
+        close(Go[0]);
+        close(Go[1]);
+        return 2;
+    }
+    if (Child == 0) {
+        char Byte;
+        close(Sync[0]);
+        close(Go[1]);
+        prctl(PR_SET_PDEATHSIG, SIGKILL);
+        if (Dir && chdir(Dir) < 0) goto Fail;
+        if (Cgroup) {
+            int F = open(Cgroup, O_WRONLY);
+            if (F < 0 || write(F, "0", 1) != 1) goto Fail;
+            close(F);
+        }
+        if (Cpu >= 0) {
+            cpu_set_t Set;
+            CPU_ZERO(&Set);
+            CPU_SET(Cpu, &Set);
+            sched_setaffinity(0, sizeof(Set), &Set);
+        }
+        if (Redirect(In, 0, O_RDONLY) < 0) goto Fail;
+        if (Redirect(Out, 1, O_WRONLY | O_CREAT | O_TRUNC) < 0) goto Fail;
+        if (Redirect(Err, 2, O_WRONLY | O_CREAT | O_TRUNC) < 0) goto Fail;
+        if (Mem > 0) {
+            struct rlimit R;
+            R.rlim_cur = R.rlim_max = (rlim_t)Mem;
+            setrlimit(RLIMIT_AS, &R);
+            setrlimit(RLIMIT_DATA, &R);
+        }
+        if (TimeMs > 0) {
+            // CPU时间限制 - 使用稍微宽松的限制避免误杀，超过软限制收到SIGXCPU
+            struct rlimit R;
+            R.rlim_cur = (rlim_t)((TimeMs * 12 / 10 + 999) / 1000);
+            R.rlim_max = R.rlim_cur + 1;
+            setrlimit(RLIMIT_CPU, &R);
+        }
+        // 等待父进程挂好计数器后再 exec，计数器在 exec 时自动启用
+        while (Perf && read(Go[0], &Byte, 1) < 0 && errno == EINTR) {}
+        execv(argv[optind], argv + optind);
+    Fail:
+        ExecErr = errno;
+        if (write(Sync[1], &ExecErr, sizeof(ExecErr)) < 0) _exit(127);
+        _exit(127);
+    }
+    close(Sync[1]);
+    close(Go[0]);
+    for (I = 0; I < 4; I++) Counters[I] = Perf ? OpenCounter(Child, CounterConfigs[I]) : -1;
+    close(Go[1]);
+
+    signal(SIGTERM, OnTerm);
+    signal(SIGINT, OnTerm);
+    signal(SIGHUP, OnTerm);
+    memset(&Timer, 0, sizeof(Timer));
+    if (WallMs > 0) {
+        Timer.it_value.tv_sec = WallMs / 1000;
+        Timer.it_value.tv_usec = (WallMs % 1000) * 1000;
+        signal(SIGALRM, OnAlarm);
+        setitimer(ITIMER_REAL, &Timer, NULL);
+    }
+    // exec 成功时管道因 O_CLOEXEC 关闭，读到 0 字节
+    do N = read(Sync[0], &ExecErr, sizeof(ExecErr)); while (N < 0 && errno == EINTR);
+    if (N <= 0) ExecErr = 0;
+    close(Sync[0]);
+    while (wait4(Child, &Status, 0, &Ru) < 0) {
+        if (errno != EINTR) return 2;
+    }
+    clock_gettime(CLOCK_MONOTONIC, &End);
+    // 先解除墙钟定时器再清除子进程号，避免定时器误杀已回收的进程号
+    memset(&Timer, 0, sizeof(Timer));
+    setitimer(ITIMER_REAL, &Timer, NULL);
+    Child = -1;
+
+    printf("exit=%d signal=%d utime=%lld stime=%lld maxrss=%ld minflt=%ld majflt=%ld "
+           "nvcsw=%ld nivcsw=%ld wall=%lld timeout=%d execerr=%d\n",
+           WIFEXITED(Status) ? WEXITSTATUS(Status) : 0,
+           WIFSIGNALED(Status) ? WTERMSIG(Status) : 0,
+           (long long)Ru.ru_utime.tv_sec * 1000000 + Ru.ru_utime.tv_usec,
+           (long long)Ru.ru_stime.tv_sec * 1000000 + Ru.ru_stime.tv_usec,
+           Ru.ru_maxrss, Ru.ru_minflt, Ru.ru_majflt, Ru.ru_nvcsw, Ru.ru_nivcsw,
+           (long long)(End.tv_sec - Start.tv_sec) * 1000000 + (End.tv_nsec - Start.tv_nsec) / 1000,
+           (int)TimedOut, ExecErr);
+    if (Perf) {
+        printf("instructions=%lld cycles=%lld cachemiss=%lld branchmiss=%lld\n",
+               ReadCounter(Counters[0]), ReadCounter(Counters[1]),
+               ReadCounter(Counters[2]), ReadCounter(Counters[3]));
+    }
+    for (I = 0; I < 4; I++) {
+        if (Counters[I] >= 0) close(Counters[I]);
+    }
+    return 0;
+}
+
+// 读取一个以换行结尾的非负整数，输入结束或格式错误时返回 -1
+static long ReadNumber(void) {
+    long Value = 0;
+    int C, Digits = 0;
+    while ((C = getchar()) != EOF && C != '\n') {
+        if (C < '0' || C > '9') return -1;
+        Value = Value * 10 + (C - '0');
+        Digits++;
+    }
+    return C == EOF || !Digits ? -1 : Value;
+}
+
+static int Serve(void) {
+    static char Name[] = "runner";
+    for (;;) {
+        long Count = ReadNumber(), I, Len;
+        char **Args;
+        int Ok = Count > 0 && Count < 4096, Code = 2;
+        if (Count < 0) return 0;
+        Args = Ok ? (char **)calloc((size_t)Count + 2, sizeof(char *)) : NULL;
+        if (!Args) return 2;
+        Args[0] = Name;
+        for (I = 1; I <= Count && Ok; I++) {
+            Len = ReadNumber();
+            Args[I] = Len >= 0 ? (char *)malloc((size_t)Len + 1) : NULL;
+            if (!Args[I] || fread(Args[I], 1, (size_t)Len, stdin) != (size_t)Len) {
+                Ok = 0;
+                break;
+            }
+            Args[I][Len] = 0;
+        }
+        if (Ok) Code = RunOnce((int)Count + 1, Args);
+        for (I = 1; I <= Count; I++) free(Args[I]);
+        free(Args);
+        if (!Ok) return 2;
+        if (Code != 0) printf("error=%d\n", Code);
+        printf("\n");
+        fflush(stdout);
+    }
+}
+
+int main(int argc, char **argv) {
+    if (argc == 2 && strcmp(argv[1], "-S") == 0) return Serve();
+    return RunOnce(argc, argv);
+}'''
+
+# 时间校准的参考基准：(名称, 参考机器上的CPU时间ms)，覆盖评测中常见的几类开销
+# 内置耗时测于 x86_64 虚拟机（/proc/cpuinfo 型号为 "Intel(R) Xeon(R) Processor"），g++ 12.2.0 (Debian)，
+# 编译选项 -std=c++17 -O2；与 MeasureBenchmarks 的方法相同：绑定单个CPU串行运行，每项取3次中最短的CPU时间，
+# 再取整到10ms。重新生成：在新的参考机器上运行 Calibrate --save-reference，把缓存目录下
+# calibration/reference.json 中的"耗时"抄到这里（不改这里时，保存的 reference.json 也会优先于内置值）
+CalibrationBenchmarks = [
+    ("整数运算", 450),
+    ("随机访存", 950),
+    ("排序", 430),
+    ("浮点运算", 340),
+    ("分支预测", 770),
+    ("哈希表与平衡树", 560),
+]
+
+# 时间校准基准程序：以基准序号作为命令行参数，只运行对应的一项
+CalibrationSource = r'''// OITools 时间校准基准，结果输出到标准输出以免被优化掉
+#include <bits/stdc++.h>
+using namespace std;
+
+int main(int argc, char **argv) {
+    int Which = argc > 1 ? atoi(argv[1]) : 0;
+    unsigned long long S = 0;
+    if (Which == 0) {
+        unsigned long long X = 1;
+        for (int I = 0; I < 200000000; I++) {
+            X = X * 6364136223846793005ULL + 1442695040888963407ULL;
+            S += X % 1000003;
+        }
+    } else if (Which == 1) {
+        const int N = 1 << 22;
+        vector<int> Next(N);
+        iota(Next.begin(), Next.end(), 0);
+        mt19937 Rng(1);
+        for (int I = N - 1; I > 0; I--) swap(Next[I], Next[Rng() % I]);
+        int P = 0;
+        for (int I = 0; I < 5000000; I++) {
+            P = Next[P];
+            S += P;
+        }
+    } else if (Which == 2) {
+        mt19937 Rng(2);
+        vector<unsigned> A(3000000);
+        for (auto &V : A) V = Rng();
+        sort(A.begin(), A.end());
+        S = A[A.size() / 2];
+    } else if (Which == 3) {
+        double X = 1.0, Y = 0.0;
+        for (int I = 0; I < 100000000; I++) {
+            X = X * 1.0000001 + 0.0000001;
+            Y += sqrt(X);
+        }
+        S = (unsigned long long)Y;
+    } else if (Which == 4) {
+        mt19937 Rng(4);
+        vector<int> A(1 << 20);
+        for (auto &V : A) V = Rng() % 100;
+        for (int R = 0; R < 100; R++)
+            for (int V : A) {
+                if (V < 50) S += V;
+                else S -= V / 3;
+            }
+    } else if (Which == 5) {
+        unordered_map<int, int> M;
+        map<int, int> T;
+        mt19937 Rng(5);
+        for (int I = 0; I < 500000; I++) {
+            int K = Rng();
+            M[K] += I;
+            if (I % 4 == 0) T[K] = I;
+        }
+        S = M.size() + T.size();
+    }
+    printf("%llu\n", S);
+    return 0;
+}'''
+
+
+class EmbeddedSample:
+    """注释块中的一组样例：只保存在文件内容中的偏移，输入与输出在访问时才解码，
+    可像字典一样以 'Num'/'Input'/'Output' 访问"""
+
+    def __init__(self, Num, Data, InputSpan, InputCount, OutputSpan, OutputCount):
+        self.Num = Num
+        self.Data = Data
+        self.InputSpan = InputSpan
+        self.InputCount = InputCount
+        self.OutputSpan = OutputSpan
+        self.OutputCount = OutputCount
+        self.Last = False
+
+    def Decode(self, Span):
+        # 与文本模式读取一致：统一换行符
+        Text = self.Data[Span[0]:Span[1]].decode('utf-8', errors='replace')
+        return Text.replace("\r\n", "\n").replace("\r", "\n")
+
+    @property
+    def Input(self):
+        InputLines = self.Decode(self.InputSpan).strip().splitlines(keepends=True)[:self.InputCount]
+        # 如果行数不足，用空行（"\n"）补齐
+        InputLines += ["\n"] * (self.InputCount - len(InputLines))
+        return "".join(InputLines)
+
+    @property
+    def Output(self):
+        RawOutput = self.Decode(self.OutputSpan).lstrip()
+        if self.Last:
+            # 注释块末尾的空白不属于输出
+            RawOutput = RawOutput.rstrip()
+        RawOutput += "\n" * self.OutputCount
+        return RawOutput.splitlines(keepends=True)[:self.OutputCount]
+
+    def __getitem__(self, Key):
+        if Key in ('Num', 'Input', 'Output'):
+            return getattr(self, Key)
+        raise KeyError(Key)
+
+    def __contains__(self, Key):
+        return Key in ('Num', 'Input', 'Output')
+
+
+class JudgeResult:
+    """单个样例的评测记录：判定、资源使用与诊断信息，库接口与 --jsonl 直接使用，命令行输出由它渲染
+    
+    Verdict 为 AC/WA/TLE/MLE/RE/ERR（评测本身失败）/CE（编译失败）；Signal 与 ExitCode 至多一个非空；
+    Mismatch 总是 (行号, 列号) 元组或 None，为输出中首个不一致的位置；Message 为交互器给出的错误信息；
+    Error 为 ERR/CE 的原因（纯文本，CE 时为编译器输出）"""
+    __slots__ = ("Num", "Verdict", "CpuTime", "WallTime", "Memory", "ExitCode", "Signal", "Stderr", "Mismatch",
+                 "Message", "Error")
+
+    def __init__(self, Num, Verdict, CpuTime=None, WallTime=None, Memory=None, ExitCode=None, Signal=None,
+                 Stderr="", Mismatch=None, Error=None, Message=None):
+        self.Num = Num
+        self.Verdict = Verdict
+        self.CpuTime = CpuTime
+        self.WallTime = WallTime
+        self.Memory = Memory
+        self.ExitCode = ExitCode
+        self.Signal = Signal
+        self.Stderr = Stderr
+        self.Mismatch = Mismatch
+        self.Message = Message
+        self.Error = Error
+
+    @property
+    def Passed(self):
+        return self.Verdict == "AC"
+
+    def ToDict(self):
+        """转换为可直接序列化为JSON的字典（时间单位ms，内存单位字节）"""
+        return {
+            "num": self.Num,
+            "verdict": self.Verdict,
+            "cpu_ms": None if self.CpuTime is None else round(self.CpuTime, 3),
+            "wall_ms": None if self.WallTime is None else round(self.WallTime, 3),
+            "memory_bytes": self.Memory,
+            "exit_code": self.ExitCode,
+            "signal": self.Signal,
+            "stderr": self.Stderr,
+            "mismatch": None if self.Mismatch is None else list(self.Mismatch),
+            "message": self.Message,
+            "error": self.Error,
+        }
+
+    def __repr__(self):
+        Usage = "" if self.CpuTime is None else f", {self.CpuTime:.0f}ms, {self.Memory / 1024 / 1024:.1f}MB"
+        return f"JudgeResult({self.Num!r}, {self.Verdict}{Usage})"
+
+
+class ClientStream(io.TextIOBase):
+    """守护进程中代替标准输出：把写入的文本以 {"out": ...} 的JSON行转发给客户端，客户端断开后丢弃输出"""
+
+    def __init__(self, Conn):
+        self.Conn = Conn
+        self.Lock = threading.Lock()
+        self.Closed = False
+
+    def Send(self, Message):
+        with self.Lock:
+            if self.Closed:
+                return
+            try:
+                self.Conn.sendall((json.dumps(Message, ensure_ascii=False) + "\n").encode("utf-8"))
+            except OSError:
+                self.Closed = True
+
+    def write(self, Text):
+        if Text:
+            self.Send({"out": Text})
+        return len(Text)
+
+    def writable(self):
+        return True
+
+
 class OItools:
     def __init__(self):
-        # 获取当前时间
+        # 正在运行的运行器进程，监视模式下新的保存到来时用于取消在途样例
+        self._LiveProcesses = set()
+        self._LiveLock = threading.Lock()
+        # 空闲的常驻运行器服务（运行器 -S），每次运行取一个，用完放回
+        self._IdleServers = []
+
+    @property
+    def Template(self):
+        """竞赛模板，使用时才按当前时间生成"""
         CurrentTime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.Template = \
+        return \
 f'''//Author: Alencryenfo
 //Date: {CurrentTime}
 #include <iostream>
@@ -57,300 +616,1414 @@ signed main() {{
             F.write(self.Template)
         print(f"✅ 模板已加载: {FileName}")
 
-    def Getonfig(self, File):
-        """从文件中获取配置和样例"""
-        with open(File, 'r', encoding='utf-8') as f:
-            content = f.read()
+    def Getonfig(self, File, Quiet=False):
+        """从文件中获取配置和样例，Quiet 为真时不输出解析失败的提示
+        
+        解析结果按 (修改时间, 大小, inode) 缓存，文件未变化时直接复用；样例为惰性对象，只记录偏移"""
+        Info = os.stat(File)
+        Stamp = (Info.st_mtime_ns, Info.st_size, Info.st_ino)
+        Cache = self.__dict__.setdefault("_ConfigCache", {})
+        Key = os.path.abspath(File)
+        Entry = Cache.get(Key)
+        if Entry is None or Entry[0] != Stamp:
+            with open(File, 'rb') as F:
+                Entry = (Stamp, *self.ParseConfigBlock(F.read()))
+            Cache[Key] = Entry
+        _, Config, Samples, Message = Entry
+        if Message and not Quiet:
+            print(Message)
+        # 调用方会修改配置（如转为手动测试），返回副本以免污染缓存
+        return (dict(Config) if Config is not None else None), list(Samples)
+
+    def FindConfigBlock(self, Data):
+        """单次扫描找到最后一个 /* ... */ 注释块，返回 ("/*" 的位置, "*/" 之后的位置)，没有时返回None"""
+        Block = None
+        Pos = 0
+        while True:
+            Start = Data.find(b"/*", Pos)
+            if Start < 0:
+                break
+            End = Data.find(b"*/", Start + 2)
+            if End < 0:
+                break
+            Block = (Start, End + 2)
+            Pos = End + 2
+        return Block
+
+    def ParseConfigBlock(self, Data):
+        """单次扫描解析最后一个注释块中的 {配置} 与 <<N 输入 >>M 输出 样例，返回 (配置, 样例列表, 提示信息)"""
         try:
-            Content = list(re.finditer(r'/\*\s*(.*?)\s*\*/', content, re.DOTALL))[-1].group(1)
-            JsonContent = re.sub(r',\s*}', '}', list(re.finditer(r'\{.*?\}', Content, re.DOTALL))[-1].group(0))
+            Block = self.FindConfigBlock(Data)
+            if Block is None:
+                raise ValueError("未找到配置注释块")
+            Begin, End = Block[0] + 2, Block[1] - 2
+            while End > Begin and Data[End - 1] in b" \t\r\n\f\v":
+                End -= 1
+            JsonStart = Data.find(b"{", Begin, End)
+            JsonEnd = Data.find(b"}", JsonStart, End) + 1 if JsonStart >= 0 else 0
+            if JsonEnd <= 0:
+                raise ValueError("注释块中没有JSON配置")
+            JsonContent = re.sub(r',\s*}', '}', Data[JsonStart:JsonEnd].decode('utf-8'))
             Config = json.loads(JsonContent)
-            if(Config.get("自动测试", 0) == 0):
-                return Config, []
-            else:
-                json_end_pos = list(re.finditer(r'\{.*?\}', Content, re.DOTALL))[-1].end()
-                SampleContent = Content[json_end_pos:]
-                Samples = []
-                
-                # 新格式：查找所有<<...>>...<<...>>模式
-                SampleMatches = re.finditer(r'<<(\d+)\s*(.*?)\s*>>(\d+)\s*(.*?)(?=<<|\Z)', SampleContent, re.DOTALL)
-                SampleNum = 1
-                
-                for Match in SampleMatches:
-                    InputCount = int(Match.group(1))
-                    InputSection = Match.group(2)
-                    OutputCount = int(Match.group(3))
-                    OutputSection = Match.group(4)
-                    
-                    InputLines = InputSection.splitlines(keepends=True)
-                    # 如果行数不足，用空行（"\n"）补齐
-                    if len(InputLines) < InputCount:
-                        InputLines += ["\n"] * (InputCount - len(InputLines))
-                    # 只取前 InputCount 行
-                    InputLines = InputLines[:InputCount]
-                    # 把它拼回一个整体字符串
-                    InputData = "".join(InputLines)
-
-                    RawOutput = OutputSection + "\n" * OutputCount
-                    OutputLines = RawOutput.splitlines(keepends=True)[:OutputCount]
-                    OutputList = OutputLines[:OutputCount]
-                    
-                    Samples.append({
-                        'Num': SampleNum,
-                        'Input': InputData,
-                        'Output': OutputList
-                    })
-                    SampleNum += 1
-                    
-                # 如果解析失败或没有样例，自动转为手动测试
-                if not Samples:
-                    print("⚠️ 样例格式不合法，自动转为手动测试")
-                    Config["自动测试"] = 0
-                    return Config, []
-                    
-                return Config, Samples
+            if Config.get("自动测试", 0) == 0:
+                return Config, [], None
+
+            Samples = []
+            Pos = JsonEnd
+            while True:
+                Mark = Data.find(b"<<", Pos, End)
+                if Mark < 0:
+                    break
+                InputStart = Mark + 2
+                while InputStart < End and 48 <= Data[InputStart] <= 57:
+                    InputStart += 1
+                if InputStart == Mark + 2:
+                    Pos = Mark + 1
+                    continue
+                # 输入一直延伸到第一个后面跟着数字的 >>
+                InputEnd = Data.find(b">>", InputStart, End)
+                while InputEnd >= 0 and not (InputEnd + 2 < End and 48 <= Data[InputEnd + 2] <= 57):
+                    InputEnd = Data.find(b">>", InputEnd + 1, End)
+                if InputEnd < 0:
+                    break
+                OutputStart = InputEnd + 2
+                while OutputStart < End and 48 <= Data[OutputStart] <= 57:
+                    OutputStart += 1
+                # 输出一直延伸到下一个 << 或注释块末尾
+                OutputEnd = Data.find(b"<<", OutputStart, End)
+                if OutputEnd < 0:
+                    OutputEnd = End
+                Samples.append(EmbeddedSample(
+                    len(Samples) + 1, Data,
+                    (InputStart, InputEnd), int(Data[Mark + 2:InputStart]),
+                    (OutputStart, OutputEnd), int(Data[InputEnd + 2:OutputStart])))
+                Pos = OutputEnd
+            if Samples and Samples[-1].OutputSpan[1] == End:
+                Samples[-1].Last = True
+
+            # 如果解析失败或没有样例，自动转为手动测试
+            if not Samples:
+                Config["自动测试"] = 0
+                return Config, [], "⚠️ 样例格式不合法，自动转为手动测试"
+            return Config, Samples, None
         except Exception as e:
-            print(f"❌ 解析配置或样例失败: {e}\n自动尝试手动输入模式")
-            return None, []
+            return None, [], f"❌ 解析配置或样例失败: {e}\n自动尝试手动输入模式"
+
+    def Check(self, OutPath, AnsPath, Config):
+        """流式比较输出文件与答案文件，返回首个不一致位置 (行号, 列号)，一致时返回None
+        
+        按块读取，内存占用与文件大小无关；"比较模式" 可选：
+        行 - 默认，忽略每行末尾的空白，行数必须一致
+        词 - 按空白分隔的词逐个比较
+        浮点 - 按词比较，数值在 "精度"（绝对或相对误差，默认1e-6）内视为相等"""
+        Mode = Config.get("比较模式", "行")
+        if not os.path.exists(OutPath):
+            OutPath = os.devnull
+        if Mode == "行":
+            # 快速路径：先逐块比较原始字节，完全相同的前缀无需逐行处理
+            Offset, Line = self.CommonPrefix(OutPath, AnsPath)
+            if Offset is None:
+                return None
+            return self.CompareStreams(self.NormalizedChunks(OutPath, Offset),
+                                       self.NormalizedChunks(AnsPath, Offset), Line)
+        Eps = float(Config.get("精度", 1e-6)) if Mode == "浮点" else None
+        Index = self.CompareTokens(self.TokenChunks(OutPath), self.TokenChunks(AnsPath), Eps)
+        if Index is None:
+            return None
+        return self.LocateToken(OutPath, Index)
 
-    def Check(self, OutList, AnsList, Config):
-        """比较输出结果 - 忽略每行末尾的空格差异"""
+    def CommonPrefix(self, OutPath, AnsPath):
+        """逐块比较两个文件的原始字节，返回 (相同前缀中最后一个行首的偏移, 该行行号)；
+        两个文件完全相同时返回 (None, None)"""
+        Offset = LineStart = Newlines = 0
+        with open(OutPath, "rb") as FO, open(AnsPath, "rb") as FA:
+            while True:
+                OutData = FO.read(CompareChunkSize)
+                if OutData != FA.read(CompareChunkSize):
+                    return LineStart, Newlines + 1
+                if not OutData:
+                    return None, None
+                Count = OutData.count(b"\n")
+                if Count:
+                    Newlines += Count
+                    LineStart = Offset + OutData.rfind(b"\n") + 1
+                Offset += len(OutData)
 
-        # 如果行数不一致，直接判为不通过
-        if len(OutList) != len(AnsList):
+    def NormalizedChunks(self, Path, Offset=0):
+        """按块读取文件并去掉每行末尾的空白，块总在换行符处切分，末行缺少换行时补齐"""
+        Carry = b""
+        with open(Path, "rb") as F:
+            F.seek(Offset)
+            while True:
+                Data = F.read(CompareChunkSize)
+                if not Data:
+                    break
+                Data = Carry + Data
+                Cut = Data.rfind(b"\n") + 1
+                if Cut == 0:
+                    Carry = Data
+                    continue
+                Carry = Data[Cut:]
+                yield self.StripTrailingSpace(Data[:Cut])
+        if Carry:
+            yield self.StripTrailingSpace(Carry + b"\n")
+
+    def StripTrailingSpace(self, Data):
+        """去掉块内每行末尾的空白；常见的行末空格、制表符和 \\r 用 bytes.replace 处理，其余情况才使用正则"""
+        if any(Char in Data for Char in RareSpaceChars):
+            return TrailingSpacePattern.sub(b"\n", Data)
+        for _ in range(4):
+            Found = False
+            for Pattern in TrailingSpaceMarkers:
+                if Pattern in Data:
+                    Data = Data.replace(Pattern, b"\n")
+                    Found = True
+            if not Found:
+                return Data
+        return TrailingSpacePattern.sub(b"\n", Data)
+
+    def CompareStreams(self, OutChunks, AnsChunks, Line=1):
+        """比较两个规范化后的字节流，遇到第一个不同立即返回其 (行号, 列号)，完全一致返回None"""
+        OutBuf = AnsBuf = b""
+        Col = 0  # 当前行已比较过的字节数
+        while True:
+            if not OutBuf:
+                OutBuf = next(OutChunks, b"")
+            if not AnsBuf:
+                AnsBuf = next(AnsChunks, b"")
+            if not OutBuf and not AnsBuf:
+                return None
+            N = min(len(OutBuf), len(AnsBuf))
+            if N == 0:
+                # 一方已结束：行数不一致
+                return Line, Col + 1
+            OutSeg, AnsSeg = OutBuf[:N], AnsBuf[:N]
+            if OutSeg != AnsSeg:
+                # 二分定位第一个不同的字节
+                Lo, Hi = 0, N
+                while Hi - Lo > 64:
+                    Mid = (Lo + Hi) // 2
+                    if OutSeg[Lo:Mid] == AnsSeg[Lo:Mid]:
+                        Lo = Mid
+                    else:
+                        Hi = Mid
+                while OutSeg[Lo] == AnsSeg[Lo]:
+                    Lo += 1
+                Prefix = OutSeg[:Lo]
+                Newlines = Prefix.count(b"\n")
+                if Newlines:
+                    return Line + Newlines, Lo - Prefix.rfind(b"\n")
+                return Line, Col + Lo + 1
+            Newlines = OutSeg.count(b"\n")
+            if Newlines:
+                Line += Newlines
+                Col = N - OutSeg.rfind(b"\n") - 1
+            else:
+                Col += N
+            OutBuf, AnsBuf = OutBuf[N:], AnsBuf[N:]
+
+    def TokenChunks(self, Path):
+        """按块读取文件并切分为词列表，跨块的词会被拼接完整"""
+        Carry = b""
+        with open(Path, "rb") as F:
+            while True:
+                Data = F.read(CompareChunkSize)
+                if not Data:
+                    break
+                Data = Carry + Data
+                Tokens = Data.split()
+                Carry = b""
+                if Tokens and not Data[-1:].isspace():
+                    Carry = Tokens.pop()
+                yield Tokens
+        if Carry:
+            yield [Carry]
+
+    def CompareTokens(self, OutChunks, AnsChunks, Eps):
+        """逐词比较两个词流，返回第一个不同的词序号（从0开始），完全一致返回None"""
+        OutBuf, AnsBuf = [], []
+        Base = 0
+        while True:
+            if not OutBuf:
+                OutBuf = next(OutChunks, None)
+                while OutBuf is not None and not OutBuf:
+                    OutBuf = next(OutChunks, None)
+                OutBuf = OutBuf or []
+            if not AnsBuf:
+                AnsBuf = next(AnsChunks, None)
+                while AnsBuf is not None and not AnsBuf:
+                    AnsBuf = next(AnsChunks, None)
+                AnsBuf = AnsBuf or []
+            if not OutBuf and not AnsBuf:
+                return None
+            N = min(len(OutBuf), len(AnsBuf))
+            if N == 0:
+                return Base
+            if OutBuf[:N] != AnsBuf[:N]:
+                for I in range(N):
+                    if not self.TokensEqual(OutBuf[I], AnsBuf[I], Eps):
+                        return Base + I
+            Base += N
+            OutBuf, AnsBuf = OutBuf[N:], AnsBuf[N:]
+
+    def TokensEqual(self, Out, Ans, Eps):
+        """比较两个词，浮点模式下允许 Eps 的绝对或相对误差"""
+        if Out == Ans:
+            return True
+        if Eps is None:
             return False
-        # 忽略每行末尾的空格和空行差异
-        for a_line, e_line in zip(OutList, AnsList):
-            if a_line.rstrip() != e_line.rstrip():
-                return False
-        return True
+        try:
+            X, Y = float(Out), float(Ans)
+        except ValueError:
+            return False
+        return abs(X - Y) <= Eps * max(1.0, abs(Y))
+
+    def LocateToken(self, Path, Index):
+        """找到文件中第 Index 个词所在的 (行号, 列号)，词数不足时返回文件末尾位置"""
+        Line = 0
+        with open(Path, "rb") as F:
+            for Line, Text in enumerate(F, 1):
+                Tokens = Text.split()
+                if Index < len(Tokens):
+                    Col = 0
+                    for I in range(Index + 1):
+                        Col = Text.index(Tokens[I], Col) + (len(Tokens[I]) if I < Index else 0)
+                    return Line, Col + 1
+                Index -= len(Tokens)
+        return Line + 1, 1
 
     def AutoTest(self, ResFile, Sample, Config):
         """使用文件I/O运行单个样例测试，符合OI评测标准"""
+        Run = self.RunSample(ResFile, Sample, Config)
+        return self.EvaluateRun(Run, Config)
+
+    def RunSample(self, ResFile, Sample, Config, Cpu=None):
+        """在独立的临时目录中运行单个样例，只收集结果不输出，可在工作线程中并行调用
+        
+        各阶段的耗时（秒）记录在 Run['Phases']：准备（写入样例文件）、启动（进程创建与运行器开销）、
+        运行（被测程序的墙钟时间）、比较"""
         Num = Sample['Num']
-        InputText = Sample['Input']
-        ExpectedList = Sample['Output']
-        TimeLimit = Config["时间限制"] / 1000.0  # 转换为秒
-        MemoryLimit = Config["内存限制"] * 1024 * 1024  # 转换为字节
+        Phases = {}
+        Run = {'Num': Num, 'Error': None, 'Phases': Phases, 'InputKey': self.InputKey(Sample)}
+
+        # 每个样例使用独立的工作目录，并行样例和多个同时运行的实例互不干扰
+        Start = time.perf_counter()
+        WorkDir = self.CreateWorkDir()
+        try:
+            InPath, OutPath, AnsPath = self.PrepareSample(Sample, WorkDir)
+        except IOError as E:
+            Run['Error'] = f"文件写入失败: {E}"
+            self.CleanupTestFiles(WorkDir)
+            return Run
+        Launch = time.perf_counter()
+        Phases['准备'] = Launch - Start
+
+        if Config.get("交互器程序"):
+            LogPath = None
+            if Config.get("交互日志"):
+                os.makedirs(Config["交互日志"], exist_ok=True)
+                LogPath = os.path.join(Config["交互日志"], f"{Num}.log")
+            Result, Interactor = self.RunInteractive(ResFile, Config, Cpu, WorkDir, InPath, OutPath, AnsPath, LogPath)
+        else:
+            # 启动被测程序（标准输入输出同样指向输入/输出文件，未使用 freopen 的程序也能评测，
+            # 与 Stress 的运行方式一致，保存的反例可以直接用 -d 复现）
+            Result = self.Execute([os.path.abspath(ResFile)], WorkDir, Config, Cpu, Stdin=InPath, Stdout=OutPath)
+            Interactor = None
+        if Result['Error']:
+            Run['Error'] = f"程序启动失败: {Result['Error']}"
+            self.CleanupTestFiles(WorkDir)
+            return Run
+        Elapsed = time.perf_counter() - Launch
+        # 运行器报告的时间可能已按校准系数换算，这里使用与外部计时一致的原始墙钟时间
+        Wall = min(Elapsed, Result['WallTime'] * (self.SpeedFactor() if Config.get("时间校准", 0) else 1) / 1000)
+        Phases['启动'] = Elapsed - Wall
+        Phases['运行'] = Wall
+
+        Run.update(Result)
+        Run.update({
+            'WorkDir': WorkDir,
+            'OutPath': OutPath,
+            'AnsPath': AnsPath,
+            'ElapsedTime': Result['CpuTime'],
+            'Mismatch': None,
+            'Message': None,
+        })
+        if Interactor is not None:
+            return self.JudgeInteraction(Run, Interactor, Config)
+        # 在工作线程中完成比较，正常结束时才需要比较输出
+        if not Result['TimeExceeded'] and not Result['MemExceeded'] and Result['ReturnCode'] == 0:
+            Start = time.perf_counter()
+            Run['Mismatch'] = self.Check(OutPath, AnsPath, Config)
+            Phases['比较'] = time.perf_counter() - Start
+        return Run
+
+    def RunInteractive(self, ResFile, Config, Cpu, WorkDir, InPath, OutPath, AnsPath, LogPath=None):
+        """交互题：交互器与被测程序通过管道互相连接，双方各由一个运行器计时，返回 (被测程序结果, 交互器结果)
         
-        # 监控变量
-        MaxMemory = 0
-        MemExceeded = False
-        TimeExceeded = False
-        StatusPath = None
+        交互器按 testlib 约定以 输入文件 输出文件 答案文件 为参数，在独立的子目录中运行；
+        不记录日志时管道直接相连，每轮交互只有内核中的一次拷贝，不经过 Python；
+        给出 LogPath 时改由 RelayInteraction 转发并记录双方的全部通信"""
+        InteractorDir = os.path.join(WorkDir, "interactor")
+        os.mkdir(InteractorDir)
+        ToSolution = os.pipe()
+        ToInteractor = os.pipe()
+        Relay = None
+        if LogPath is None:
+            SolutionFds = (ToSolution[0], ToInteractor[1])
+            InteractorFds = (ToInteractor[0], ToSolution[1])
+        else:
+            FromSolution = os.pipe()
+            FromInteractor = os.pipe()
+            SolutionFds = (ToSolution[0], FromSolution[1])
+            InteractorFds = (ToInteractor[0], FromInteractor[1])
+            Relay = threading.Thread(target=self.RelayInteraction, daemon=True, args=(
+                [(FromSolution[0], ToInteractor[1], b"> "), (FromInteractor[0], ToSolution[1], b"< ")], LogPath))
+            Relay.start()
+
+        Results = {}
+
+        def StartInteractor():
+            Results['Interactor'] = self.Execute(
+                [Config["交互器程序"], InPath, OutPath, AnsPath], InteractorDir, Config,
+                Stdin=f"/dev/fd/{InteractorFds[0]}", Stdout=f"/dev/fd/{InteractorFds[1]}", Fds=InteractorFds)
+
+        Thread = threading.Thread(target=StartInteractor)
+        Thread.start()
+        Result = self.Execute([os.path.abspath(ResFile)], WorkDir, Config, Cpu,
+                              Stdin=f"/dev/fd/{SolutionFds[0]}", Stdout=f"/dev/fd/{SolutionFds[1]}", Fds=SolutionFds)
+        Thread.join()
+        if Relay is not None:
+            Relay.join()
+        return Result, Results['Interactor']
+
+    def RelayInteraction(self, Routes, LogPath):
+        """带日志的交互转发：用 poll 非阻塞地在 (读端, 写端, 前缀) 之间搬运数据，并按方向逐行写入日志
         
-        def SetResourceLimits():
-            """设置资源限制 - OI标准"""
-            # 内存限制：虚拟内存和物理内存
-            resource.setrlimit(resource.RLIMIT_AS, (MemoryLimit, MemoryLimit))
-            resource.setrlimit(resource.RLIMIT_DATA, (MemoryLimit, MemoryLimit))
-            # CPU时间限制 - 使用稍微宽松的限制避免误杀
-            CpuTimeLimit = int(TimeLimit * 1.2)  
-            resource.setrlimit(resource.RLIMIT_CPU, (CpuTimeLimit, CpuTimeLimit))
-            
-        def GetMemoryUsage():
-            """获取当前内存使用情况"""
-            nonlocal MaxMemory
+        某个方向的数据尚未写完时不再读取该方向，缓冲区不会无限增长；读端关闭且数据写完后关闭对应写端"""
+        Pending = [b""] * len(Routes)
+        LineStart = [True] * len(Routes)
+        Readers = {Route[0]: Index for Index, Route in enumerate(Routes)}
+        Writers = {Route[1]: Index for Index, Route in enumerate(Routes)}
+        for Fd in Writers:
+            os.set_blocking(Fd, False)
+        Poller = select.poll()
+
+        def CloseWriter(Index):
+            Fd = Routes[Index][1]
+            if Fd in Writers:
+                del Writers[Fd]
+                os.close(Fd)
+
+        with open(LogPath, "wb") as Log:
+            while Readers or any(Pending[Index] for Index in Writers.values()):
+                Watched = []
+                for Fd, Index in Readers.items():
+                    if not Pending[Index]:
+                        Watched.append((Fd, select.POLLIN))
+                for Fd, Index in Writers.items():
+                    if Pending[Index]:
+                        Watched.append((Fd, select.POLLOUT))
+                for Fd, Mask in Watched:
+                    Poller.register(Fd, Mask)
+                try:
+                    Events = Poller.poll()
+                finally:
+                    for Fd, _ in Watched:
+                        Poller.unregister(Fd)
+                for Fd, Event in Events:
+                    if Fd in Readers:
+                        Index = Readers[Fd]
+                        Data = os.read(Fd, 65536)
+                        if not Data:
+                            del Readers[Fd]
+                            os.close(Fd)
+                            if not Pending[Index]:
+                                CloseWriter(Index)
+                            continue
+                        if Routes[Index][1] in Writers:
+                            Pending[Index] = Data
+                        Text = bytearray()
+                        for Line in re.findall(rb"[^\n]*\n|[^\n]+", Data):
+                            if LineStart[Index]:
+                                Text += Routes[Index][2]
+                            Text += Line
+                            LineStart[Index] = Line.endswith(b"\n")
+                        Log.write(Text)
+                    elif Fd in Writers:
+                        Index = Writers[Fd]
+                        try:
+                            Written = os.write(Fd, Pending[Index])
+                        except (BrokenPipeError, BlockingIOError) as E:
+                            if isinstance(E, BlockingIOError):
+                                continue
+                            # 接收方已退出，丢弃剩余数据，读端继续读取以便记录
+                            Pending[Index] = b""
+                            CloseWriter(Index)
+                            continue
+                        Pending[Index] = Pending[Index][Written:]
+                        if not Pending[Index] and Routes[Index][0] not in Readers:
+                            CloseWriter(Index)
+            for Index in list(Writers.values()):
+                CloseWriter(Index)
+
+    def JudgeInteraction(self, Run, Interactor, Config):
+        """根据交互器的退出码判定交互题：0 为通过，1/2 为答案错误（错误信息取交互器的标准错误），其余为交互器异常
+        
+        被测程序本身超时、超内存或运行错误时以被测程序的结果为准；交互器判错后被测程序因写入已关闭的管道而
+        收到 SIGPIPE 属于正常结束"""
+        Run['Interactor'] = Interactor
+        Limit = Config["时间限制"]
+        if Interactor['Error']:
+            Run['Error'] = f"交互器启动失败: {Interactor['Error']}"
+        elif Run['TimeExceeded'] or Run['MemExceeded']:
+            pass
+        elif Interactor['WallExceeded'] and not Interactor['CpuTime'] > Limit:
+            # 交互器只是在等待（双方互相等待），视为程序未及时响应
+            Run['TimeExceeded'] = True
+        elif Interactor['TimeExceeded'] or Interactor['MemExceeded'] or Interactor['ReturnCode'] not in (0, 1, 2):
+            if Run['ReturnCode'] == 0:
+                Detail = "时间超限" if Interactor['TimeExceeded'] else "内存超限" if Interactor['MemExceeded'] \
+                    else f"退出码 {Interactor['ReturnCode']}"
+                Message = Interactor['Stderr'].strip()
+                Run['Error'] = f"交互器异常 ({Detail})" + (f"\n{Message}" if Message else "")
+        elif Interactor['ReturnCode'] != 0:
+            if Run['ReturnCode'] in (0, -signal.SIGPIPE):
+                Run['ReturnCode'] = 0
+                Lines = Interactor['Stderr'].strip().splitlines()
+                Run['Message'] = Lines[0] if Lines else f"交互器返回 {Interactor['ReturnCode']}"
+        if Run['Error'] and Run.get('WorkDir'):
+            self.CleanupTestFiles(Run['WorkDir'])
+        return Run
+
+    def PrepareSample(self, Sample, WorkDir):
+        """在工作目录中准备样例文件，返回 (输入路径, 输出路径, 答案路径)
+        
+        外部数据的输入由 DeliverInput 放入（不会改写原文件），答案直接引用原文件；注释中的样例写入临时文件"""
+        InPath = os.path.join(WorkDir, "test.in")
+        OutPath = os.path.join(WorkDir, "test.out")
+        AnsPath = os.path.join(WorkDir, "test.ans")
+        if 'InputPath' in Sample:
+            self.DeliverInput(Sample['InputPath'], InPath)
+            AnsPath = Sample['AnswerPath']
+        else:
+            with open(InPath, "w", encoding="utf-8") as F:
+                F.write(Sample['Input'])
+            with open(AnsPath, "w", encoding="utf-8") as F:
+                F.writelines(Sample['Output'])
+        return InPath, OutPath, AnsPath
+
+    def DeliverInput(self, Source, Target):
+        """把外部输入文件放入工作目录，被测程序无法借此改写原始数据：
+        
+        优先使用 reflink（写时复制）；原文件对本用户只读时使用硬链接或符号链接（零拷贝）；
+        否则复制一份（以 root 运行时权限不起作用，总是复制）"""
+        try:
+            with open(Source, "rb") as Src, open(Target, "wb") as Dst:
+                fcntl.ioctl(Dst.fileno(), FICLONE, Src.fileno())
+            return
+        except OSError:
             try:
-                with open(StatusPath, 'r') as F:
-                    Content = F.read()
-                    VmSize = 0
-                    VmRSS = 0
-                    
-                    # 同时检查VmSize（虚拟内存）和VmRSS（物理内存）
-                    for Line in Content.splitlines():
-                        if Line.startswith('VmSize:'):
-                            VmSize = int(Line.split()[1]) * 1024  # kB转字节
-                        elif Line.startswith('VmRSS:'):
-                            VmRSS = int(Line.split()[1]) * 1024  # kB转字节
-                    
-                    # 使用VmSize和VmRSS中的较大值作为内存使用量
-                    CurrentMem = max(VmSize, VmRSS)
-                    MaxMemory = max(MaxMemory, CurrentMem)
-                    return CurrentMem
-            except (FileNotFoundError, ValueError, IndexError, ProcessLookupError):
-                return 0
-                
-        def MonitorProcess(Process):
-            """监控进程资源使用 - OI优化版本"""
-            nonlocal MaxMemory, MemExceeded
-            
-            # 阶段1: 程序启动阶段 - 极密集监控内存分配
-            StartupChecks = 50  # 增加检查次数
-            for I in range(StartupChecks):
-                if Process.poll() is not None:
+                os.remove(Target)
+            except FileNotFoundError:
+                pass
+        if os.geteuid() != 0 and not os.access(Source, os.W_OK):
+            try:
+                os.link(Source, Target)
+            except OSError:
+                os.symlink(os.path.abspath(Source), Target)
+            return
+        shutil.copyfile(Source, Target)
+
+    def NaturalKey(self, Name):
+        """自然排序的键：数字部分按数值比较（2 排在 10 之前）"""
+        return [int(Part) if Part.isdigit() else Part for Part in re.split(r'(\d+)', Name)]
+
+    def DiscoverData(self, DataDir):
+        """惰性枚举数据目录中的测试点：每个 *.in 与同名的 *.ans（或 *.out）配对，按自然顺序产出
+        
+        只读取文件名，不读取文件内容，内存占用与数据大小无关"""
+        with os.scandir(DataDir) as It:
+            Names = sorted((Entry.name for Entry in It if Entry.name.endswith(".in")), key=self.NaturalKey)
+        for Name in Names:
+            Stem = Name[:-3]
+            for Suffix in (".ans", ".out"):
+                Answer = os.path.join(DataDir, Stem + Suffix)
+                if os.path.exists(Answer):
+                    yield {'Num': Stem, 'InputPath': os.path.join(DataDir, Name), 'AnswerPath': Answer}
                     break
-                    
-                CurrentMem = GetMemoryUsage()
-                if CurrentMem > MemoryLimit:
-                    MemExceeded = True
-                    Process.terminate()  # 优先使用terminate而非kill
-                    time.sleep(0.01)
-                    if Process.poll() is None:
-                        Process.kill()
-                    return
-                    
-                time.sleep(0.001)  # 1ms间隔，更密集监控
-            
-            # 阶段2: 运行时监控 - 降低频率
-            while Process.poll() is None:
-                CurrentMem = GetMemoryUsage()
-                if CurrentMem > MemoryLimit:
-                    MemExceeded = True
-                    Process.terminate()
-                    time.sleep(0.01)
-                    if Process.poll() is None:
-                        Process.kill()
-                    return
-                    
-                time.sleep(0.05)  # 50ms间隔，降低CPU占用
+
+    def GetRunner(self):
+        """获取（必要时编译）运行器，编译失败时返回None并回退到纯Python实现"""
+        if getattr(self, "_Runner", None) is None:
+            Key = hashlib.sha256((self.CompilerVersion() + RunnerSource).encode()).hexdigest()[:16]
+            Runner = os.path.join(self.GetCacheDir("runner"), f"runner-{Key}")
+            if not os.path.exists(Runner):
+                Tmp = f"{Runner}.{os.getpid()}.tmp"
+                Result = subprocess.run(['g++', '-x', 'c++', '-O2', '-o', Tmp, '-'],
+                                        input=RunnerSource, capture_output=True, text=True)
+                if Result.returncode != 0:
+                    self._Runner = ""
+                    return None
+                os.replace(Tmp, Runner)
+            self._Runner = Runner
+        return self._Runner or None
+
+    def ServerRun(self, Runner, Request):
+        """通过常驻的运行器服务执行一次运行，省去每次启动运行器进程的开销
         
-        # 准备测试文件
+        返回运行器的输出；服务无法启动时返回None（由调用方回退为单独启动运行器），
+        服务在运行中途退出（如被 CancelRuns 终止）时返回空字符串"""
+        with self._LiveLock:
+            Server = self._IdleServers.pop() if self._IdleServers else None
+        if Server is None:
+            try:
+                Server = subprocess.Popen([Runner, '-S'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL)
+            except OSError:
+                return None
+        Payload = [f"{len(Request)}\n".encode()]
+        for Arg in map(os.fsencode, Request):
+            Payload += [f"{len(Arg)}\n".encode(), Arg]
+        Lines = []
+        with self._LiveLock:
+            self._LiveProcesses.add(Server)
         try:
-            with open("test.in", "w", encoding="utf-8") as F:
-                F.write(InputText)
-            with open("test.ans", "w", encoding="utf-8") as F:
-                F.writelines(ExpectedList)
-        except IOError as E:
-            print(f"❌ 样例 {Num} 文件写入失败: {E}")
-            return False
-            
-        # 启动被测程序
-        StartTime = time.perf_counter()
+            Server.stdin.write(b"".join(Payload))
+            Server.stdin.flush()
+            while True:
+                Line = Server.stdout.readline()
+                if Line in (b"\n", b""):
+                    break
+                Lines.append(Line)
+        except OSError:
+            Line = b""
+        finally:
+            with self._LiveLock:
+                self._LiveProcesses.discard(Server)
+        if Line != b"\n":
+            Server.kill()
+            Server.wait()
+            return ""
+        with self._LiveLock:
+            self._IdleServers.append(Server)
+        return b"".join(Lines).decode()
+
+    def CancelRuns(self):
+        """终止所有在途的运行器进程（运行器收到 SIGTERM 后会先杀死被测程序）"""
+        with self._LiveLock:
+            Live = list(self._LiveProcesses)
+        for Proc in Live:
+            try:
+                Proc.terminate()
+            except OSError:
+                pass
+
+    def CreateCgroup(self, MemoryLimit, Config):
+        """在配置的 cgroup v2 目录（"控制组" 或 $OITOOLS_CGROUP）下为单次运行创建子组，不可用时返回None"""
+        Base = Config.get("控制组") or os.environ.get("OITOOLS_CGROUP")
+        if not Base or not os.path.exists(os.path.join(Base, "cgroup.procs")):
+            return None
+        Group = os.path.join(Base, f"oitools-{os.getpid()}-{threading.get_ident()}-{time.monotonic_ns()}")
         try:
-            Process = subprocess.Popen(
-                [os.path.abspath(ResFile)],
-                stderr=subprocess.PIPE,
-                stdout=subprocess.DEVNULL,  # 输出重定向到文件
-                stdin=subprocess.DEVNULL,   # 输入来自文件
-                text=True,
-                preexec_fn=SetResourceLimits
-            )
-        except OSError as E:
-            print(f"❌ 样例 {Num} 程序启动失败: {E}")
-            self.CleanupTestFiles()
-            return False
-            
-        StatusPath = f"/proc/{Process.pid}/status"
-        
-        # 启动监控线程
-        MonitorThread = threading.Thread(
-            target=MonitorProcess, args=(Process,), daemon=True
-        )
-        MonitorThread.start()
+            os.mkdir(Group)
+            with open(os.path.join(Group, "memory.max"), "w") as F:
+                F.write(str(MemoryLimit))
+            try:
+                with open(os.path.join(Group, "memory.swap.max"), "w") as F:
+                    F.write("0")
+            except OSError:
+                pass
+        except OSError:
+            try:
+                os.rmdir(Group)
+            except OSError:
+                pass
+            return None
+        return Group
+
+    def ReadCgroup(self, Group):
+        """读取并删除 cgroup 子组，返回 (峰值内存字节数或None, 是否发生OOM)"""
+        Peak = None
+        OomKilled = False
+        try:
+            with open(os.path.join(Group, "memory.peak")) as F:
+                Peak = int(F.read())
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(os.path.join(Group, "memory.events")) as F:
+                for Line in F:
+                    Key, _, Value = Line.partition(" ")
+                    if Key in ("oom_kill", "oom_group_kill") and int(Value) > 0:
+                        OomKilled = True
+        except (OSError, ValueError):
+            pass
+        try:
+            os.rmdir(Group)
+        except OSError:
+            pass
+        return Peak, OomKilled
+
+    def Execute(self, Command, WorkDir, Config, Cpu=None, Stdin=None, Stdout=None, Env=None, Sanitized=False,
+                Fds=()):
+        """在 WorkDir 中运行程序并返回内核统计的资源使用情况，AutoTest 与 ManualTest 共用
         
-        # 等待程序完成 - 使用精确计时
+        CPU时间与峰值内存来自 wait4 的 rusage，不再轮询 /proc；
+        配置了 cgroup v2 时额外使用 memory.max 限制并以 memory.peak 作为峰值内存。
+        Sanitized 为真时（ASan 需要保留巨大的影子内存虚拟地址空间）不设置地址空间限制，也不判定内存超限；
+        开启"时间校准"时按本机速度系数放宽实际限制，返回的时间换算为参考机器上的时间；
+        Fds 为需要传给被测程序的文件描述符（如交互题的管道，以 /dev/fd/N 作为 Stdin/Stdout），启动后在本进程中关闭"""
+        Factor = self.SpeedFactor() if Config.get("时间校准", 0) else 1.0
+        TimeLimitMS = math.ceil(Config["时间限制"] * Factor)
+        MemoryLimit = Config["内存限制"] * 1024 * 1024  # 转换为字节
+        # 墙钟时间只用于兜底（如程序阻塞等待），时间超限以CPU时间判定
+        WallLimitMS = TimeLimitMS * 2 + 1000
+        ErrPath = os.path.join(WorkDir, "test.err")
+        Result = {'Error': None}
+
+        Group = self.CreateCgroup(MemoryLimit, Config)
+        Runner = self.GetRunner()
+        if Runner is not None:
+            Args = [Runner, '-t', str(TimeLimitMS), '-w', str(WallLimitMS),
+                    '-m', str(0 if Sanitized else MemoryLimit), '-e', ErrPath]
+            if Cpu is not None:
+                Args += ['-c', str(Cpu)]
+            if Stdin is not None:
+                Args += ['-i', Stdin]
+            if Stdout is not None:
+                Args += ['-o', Stdout]
+            if Group is not None:
+                Args += ['-g', os.path.join(Group, "cgroup.procs")]
+            if Config.get("性能计数器", 0):
+                Args += ['-p']
+            # 需要传递文件描述符或环境变量时服务无法代劳，改为单独启动一个运行器
+            Reply = None
+            if not Fds and Env is None and Config.get("启动服务", 1) != 0:
+                Reply = self.ServerRun(Runner, [*Args[1:], '-d', WorkDir, '--', *Command])
+            if Reply is None:
+                try:
+                    Proc = subprocess.Popen([*Args, '--', *Command], cwd=WorkDir, stdin=subprocess.DEVNULL,
+                                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=Env,
+                                            pass_fds=Fds)
+                finally:
+                    for Fd in Fds:
+                        os.close(Fd)
+                with self._LiveLock:
+                    self._LiveProcesses.add(Proc)
+                try:
+                    Reply, ErrText = Proc.communicate()
+                finally:
+                    with self._LiveLock:
+                        self._LiveProcesses.discard(Proc)
+                Code = Proc.returncode
+            else:
+                ErrText = ""
+                Code = -1 if not Reply else 0
+            Stats = dict(Item.split('=', 1) for Item in Reply.split())
+            Code = int(Stats.get('error', Code))
+            if Code != 0 or 'exit' not in Stats:
+                Result['Error'] = ErrText.strip() or f"运行器异常退出 ({Code})"
+            elif int(Stats['execerr']):
+                Result['Error'] = os.strerror(int(Stats['execerr']))
+            else:
+                Signal = int(Stats['signal'])
+                Result.update({
+                    'ReturnCode': -Signal if Signal else int(Stats['exit']),
+                    'CpuTime': (int(Stats['utime']) + int(Stats['stime'])) / 1000,
+                    'WallTime': int(Stats['wall']) / 1000,
+                    'MaxMemory': int(Stats['maxrss']) * 1024,
+                    'WallExceeded': Stats['timeout'] == '1',
+                    'MinorFaults': int(Stats['minflt']),
+                    'MajorFaults': int(Stats['majflt']),
+                    'VoluntarySwitches': int(Stats['nvcsw']),
+                    'InvoluntarySwitches': int(Stats['nivcsw']),
+                })
+                if 'instructions' in Stats:
+                    Result['Counters'] = {Name: (int(Stats[Key]) if int(Stats[Key]) >= 0 else None)
+                                          for Name, Key in (('Instructions', 'instructions'),
+                                                            ('Cycles', 'cycles'),
+                                                            ('CacheMisses', 'cachemiss'),
+                                                            ('BranchMisses', 'branchmiss'))}
+        else:
+            self.ExecuteDirect(Command, WorkDir, TimeLimitMS, WallLimitMS, 0 if Sanitized else MemoryLimit,
+                               Cpu, Stdin, Stdout, ErrPath, Group, Result, Env, Fds)
+
+        if Group is not None:
+            Peak, OomKilled = self.ReadCgroup(Group)
+            if Peak is not None and 'MaxMemory' in Result:
+                Result['MaxMemory'] = Peak
+            Result['OomKilled'] = OomKilled
+        if Result['Error']:
+            return Result
+
+        ReturnCode = Result['ReturnCode']
+        Result['CpuTime'] /= Factor
+        Result['WallTime'] /= Factor
+        Result['TimeExceeded'] = (Result['WallExceeded'] or Result['CpuTime'] > Config["时间限制"]
+                                  or ReturnCode == -signal.SIGXCPU)
+        Result['MemExceeded'] = not Sanitized and (Result['MaxMemory'] > MemoryLimit or Result.get('OomKilled', False))
         try:
-            Stdout, Stderr = Process.communicate(timeout=TimeLimit)
-        except subprocess.TimeoutExpired:
-            TimeExceeded = True
-            Process.terminate()
-            time.sleep(0.01)
-            if Process.poll() is None:
+            with open(ErrPath, "r", encoding="utf-8", errors="replace") as F:
+                Result['Stderr'] = F.read()
+        except FileNotFoundError:
+            Result['Stderr'] = ""
+        return Result
+
+    def ExecuteDirect(self, Command, WorkDir, TimeLimitMS, WallLimitMS, MemoryLimit,
+                      Cpu, Stdin, Stdout, ErrPath, Group, Result, Env=None, Fds=()):
+        """运行器不可用时的回退实现：Popen + pidfd 等待 + wait4（峰值内存会包含解释器fork时的占用）"""
+
+        def SetResourceLimits():
+            """设置资源限制 - OI标准"""
+            if Group is not None:
+                with open(os.path.join(Group, "cgroup.procs"), "w") as F:
+                    F.write("0")
+            # 内存限制：虚拟内存和物理内存（为0时不限制）
+            if MemoryLimit:
+                resource.setrlimit(resource.RLIMIT_AS, (MemoryLimit, MemoryLimit))
+                resource.setrlimit(resource.RLIMIT_DATA, (MemoryLimit, MemoryLimit))
+            # CPU时间限制 - 使用稍微宽松的限制避免误杀
+            CpuTimeLimit = -(-TimeLimitMS * 12 // 10000)
+            resource.setrlimit(resource.RLIMIT_CPU, (CpuTimeLimit, CpuTimeLimit + 1))
+            # 绑定到工作槽位对应的CPU，避免并行样例互相迁移干扰
+            if Cpu is not None:
+                os.sched_setaffinity(0, {Cpu})
+
+        StartTime = time.perf_counter()
+        try:
+            with open(Stdin or os.devnull, "rb") as In, \
+                    open(Stdout or os.devnull, "wb") as Out, open(ErrPath, "wb") as Err:
+                Process = subprocess.Popen(Command, stdin=In, stdout=Out, stderr=Err, env=Env,
+                                           cwd=WorkDir, preexec_fn=SetResourceLimits)
+        except (OSError, subprocess.SubprocessError) as E:
+            Result['Error'] = str(E)
+            return
+        finally:
+            for Fd in Fds:
+                os.close(Fd)
+        with self._LiveLock:
+            self._LiveProcesses.add(Process)
+
+        # 通过 pidfd 等待进程退出，无需轮询；不支持时退化为定时器兜底
+        WallExceeded = False
+        try:
+            PidFd = os.pidfd_open(Process.pid)
+        except (AttributeError, OSError):
+            PidFd = None
+        if PidFd is not None:
+            Poller = select.poll()
+            Poller.register(PidFd, select.POLLIN)
+            if not Poller.poll(WallLimitMS):
+                WallExceeded = True
                 Process.kill()
+            os.close(PidFd)
+            _, Status, Usage = os.wait4(Process.pid, 0)
+        else:
+            def Kill():
+                nonlocal WallExceeded
+                WallExceeded = True
+                Process.kill()
+            Timer = threading.Timer(WallLimitMS / 1000, Kill)
+            Timer.start()
+            _, Status, Usage = os.wait4(Process.pid, 0)
+            Timer.cancel()
+        # wait4 已回收子进程，告知 Popen 避免重复等待
+        Process.returncode = os.waitstatus_to_exitcode(Status)
+        with self._LiveLock:
+            self._LiveProcesses.discard(Process)
+
+        Result.update({
+            'ReturnCode': Process.returncode,
+            'CpuTime': (Usage.ru_utime + Usage.ru_stime) * 1000,
+            'WallTime': (time.perf_counter() - StartTime) * 1000,
+            'MaxMemory': Usage.ru_maxrss * 1024,  # Linux上是KB，转换为字节
+            'WallExceeded': WallExceeded,
+            'MinorFaults': Usage.ru_minflt,
+            'MajorFaults': Usage.ru_majflt,
+            'VoluntarySwitches': Usage.ru_nvcsw,
+            'InvoluntarySwitches': Usage.ru_nivcsw,
+        })
+
+    def EvaluateRun(self, Run, Config):
+        """输出RunSample收集到的单个样例结果，返回是否通过"""
+        Result = self.MakeResult(Run, Config)
+        try:
+            self.ShowResult(Result, Run, Config)
+        finally:
+            if Run.get('WorkDir'):
+                self.CleanupTestFiles(Run['WorkDir'])
+        return Result.Passed
+
+    def MakeResult(self, Run, Config):
+        """把 RunSample 收集到的运行结果转换为评测记录，不做任何输出"""
+        if Run['Error']:
+            return JudgeResult(Run['Num'], "ERR", Error=Run['Error'])
+        Code = Run['ReturnCode']
+        Stderr = Run.get('Stderr') or ""
+        if len(Stderr) > StderrExcerptSize:
+            Stderr = Stderr[:StderrExcerptSize] + "…"
+        return JudgeResult(Run['Num'], self.Classify(Run, Config), Run['CpuTime'], Run['WallTime'], Run['MaxMemory'],
+                           Code if Code >= 0 else None, -Code if Code < 0 else None, Stderr, Run['Mismatch'],
+                           Message=Run.get('Message'))
+
+    def Classify(self, Run, Config):
+        """把单次运行结果归类为 AC/WA/TLE/MLE/RE，评测记录与各命令共用这一判定规则"""
+        if Run['TimeExceeded']:
+            return 'TLE'
+        if Run['MemExceeded']:
+            return 'MLE'
+        if Run['ReturnCode'] != 0:
+            if Run['ReturnCode'] == -signal.SIGABRT and (
+                    Run['MaxMemory'] / (1024 * 1024) > Config["内存限制"] * 0.8
+                    or "bad_alloc" in (Run.get('Stderr') or "")):
+                return 'MLE'
+            return 'RE'
+        return 'AC' if Run['Mismatch'] is None and not Run.get('Message') else 'WA'
+
+    def ParallelAutoTest(self, ResFile, Samples, Config, Workers, Cancel=None, OnResult=None):
+        """并行运行全部样例并按原样例顺序输出结果，返回 (通过数, 总数)
+        
+        Cancel 被设置后不再启动新样例，已完成的结果丢弃不输出；OnResult 在输出每个结果前被调用"""
+        PassedCount = TotalCount = 0
+        for Run in self.ParallelRuns(ResFile, Samples, Config, Workers, Cancel):
+            TotalCount += 1
+            if OnResult is not None:
+                OnResult(Run)
+            if self.EvaluateRun(Run, Config):
+                PassedCount += 1
+        return PassedCount, TotalCount
+
+    def MakeSlots(self, Workers):
+        """并行工作槽位：Workers 个CPU编号的队列，轮流分配当前可用的CPU，取出即占用、放回即释放"""
+        Cpus = sorted(os.sched_getaffinity(0))
+        Slots = queue.Queue()
+        for I in range(Workers):
+            Slots.put(Cpus[I % len(Cpus)])
+        return Slots
+
+    def ParallelRuns(self, ResFile, Samples, Config, Workers, Cancel=None):
+        """并行运行样例的生成器：每个工作槽位绑定一个CPU，按原样例顺序产出 RunSample 的结果
+        
+        产出的工作目录由调用方清理；Cancel 被设置后不再启动新样例，已完成的结果直接清理丢弃"""
+        Workers = max(1, Workers)
+        Slots = self.MakeSlots(Workers)
+
+        def Worker(Sample):
+            Cpu = Slots.get()
             try:
-                Stdout, Stderr = Process.communicate(timeout=0.1)
-            except subprocess.TimeoutExpired:
-                Stdout, Stderr = "", "程序因超时被终止"
-                
-        # 停止监控
-        MonitorThread.join(timeout=0.1)
-        ElapsedTime = (time.perf_counter() - StartTime) * 1000  # 转换为毫秒
+                if Cancel is not None and Cancel.is_set():
+                    return None
+                return self.RunSample(ResFile, Sample, Config, Cpu)
+            finally:
+                Slots.put(Cpu)
+
+        with ThreadPoolExecutor(max_workers=Workers) as Pool:
+            # 样例可能来自惰性枚举的数据目录，只保持有限个任务在途
+            Pending = deque()
+            for Sample in itertools.chain(Samples, [None]):
+                if Cancel is not None and Cancel.is_set():
+                    Sample = None
+                if Sample is not None:
+                    Pending.append(Pool.submit(Worker, Sample))
+                    if len(Pending) < Workers * 2:
+                        continue
+                # 按提交顺序取结果，保证输出顺序与样例顺序一致
+                while Pending and (Sample is None or len(Pending) >= Workers * 2):
+                    Run = Pending.popleft().result()
+                    if Cancel is not None and Cancel.is_set():
+                        if Run is not None and Run.get('WorkDir'):
+                            self.CleanupTestFiles(Run['WorkDir'])
+                        continue
+                    yield Run
+                if Sample is None:
+                    break
+
+    def ResolveWorkers(self, Workers, Config):
+        """并行数：命令行参数优先，其次为配置中的"并行测试"，最后为 DefaultWorkers，0表示使用全部可用CPU"""
+        if Workers is None:
+            Workers = Config.get("并行测试", DefaultWorkers)
+        if Workers <= 0:
+            Workers = len(os.sched_getaffinity(0))
+        return Workers
+
+    def Judge(self, File, Workers=None, DataDir=None, Interactor=None, Overrides=None):
+        """库接口：编译并评测源文件中的样例（或数据目录），按样例顺序产出 JudgeResult，不输出任何内容
         
-        # 获取程序输出
-        ActualList = []
+        Overrides 中的键覆盖源文件中的配置；没有样例时不产出记录，编译失败时产出一条 CE 记录，
+        源文件或数据目录不存在时产出一条 ERR 记录"""
+        if not os.path.exists(File):
+            yield JudgeResult(None, "ERR", Error=f"文件不存在: {File}")
+            return
+        Config, Samples = self.Getonfig(File, Quiet=True)
+        Config = self.WithDefaults(Config, Overrides)
+        if DataDir is None and Config.get("数据目录"):
+            DataDir = os.path.join(os.path.dirname(os.path.abspath(File)), Config["数据目录"])
+        if DataDir is not None:
+            if not os.path.isdir(DataDir):
+                yield JudgeResult(None, "ERR", Error=f"数据目录不存在: {DataDir}")
+                return
+            Samples = self.DiscoverData(DataDir)
+
+        Error = self.PrepareInteractor(File, Config, Interactor)
+        if Error:
+            yield JudgeResult(None, "CE", Error=Error)
+            return
+        ResFile, _, Output = self.Compile(File, Config, UseCache=Config.get("编译缓存", 1) != 0,
+                                          Debug=not Config.get("交互器程序"))
+        if ResFile is None:
+            yield JudgeResult(None, "CE", Error=Output)
+            return
+        Workers = self.ResolveWorkers(Workers, Config)
         try:
-            with open("test.out", "r", encoding="utf-8") as F:
-                ActualList = F.readlines()
-        except FileNotFoundError:
-            ActualList = []
-        except UnicodeDecodeError:
-            print(f"❌ 样例 {Num} 输出文件编码错误")
-            self.CleanupTestFiles()
-            return False
-            
-        # 判题逻辑
-        Result = self.EvaluateResult(
-            Num, Process.returncode, TimeExceeded, MemExceeded,
-            ActualList, ExpectedList, Stderr, ElapsedTime, MaxMemory, Config
-        )
+            for Run in self.ParallelRuns(ResFile, Samples, Config, Workers):
+                if Run.get('WorkDir'):
+                    self.CleanupTestFiles(Run['WorkDir'])
+                yield self.MakeResult(Run, Config)
+        finally:
+            self.ReleaseBinary(ResFile)
+
+    def OpenResultCache(self):
+        """打开结果缓存数据库（缓存目录下的 results/results.db）"""
+        Db = sqlite3.connect(os.path.join(self.GetCacheDir("results"), "results.db"), timeout=30)
+        Db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, ino INTEGER, digest TEXT);
+            CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, verdict TEXT, cputime REAL, memory INTEGER, updated REAL);
+            CREATE TABLE IF NOT EXISTS history (source TEXT, num TEXT, verdict TEXT, updated REAL, PRIMARY KEY (source, num));
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value REAL);
+        """)
+        return Db
+
+    def PruneResultCache(self, Db, Force=False):
+        """清理结果缓存（距上次清理不足 ResultCachePruneInterval 秒时跳过，Force 为真时总是清理）：
+        删除已不存在的文件与源文件的记录，通过记录与文件哈希超过 ResultCacheLimit 条时淘汰最久未使用的"""
+        Now = time.time()
+        Row = Db.execute("SELECT value FROM meta WHERE name='pruned'").fetchone()
+        if not Force and Row and Now - Row[0] < ResultCachePruneInterval:
+            return
+        Db.executemany("DELETE FROM files WHERE path=?",
+                       [(Path,) for Path, in Db.execute("SELECT path FROM files") if not os.path.exists(Path)])
+        Db.executemany("DELETE FROM history WHERE source=?",
+                       [(Source,) for Source, in Db.execute("SELECT DISTINCT source FROM history")
+                        if not os.path.exists(Source)])
+        # INSERT OR REPLACE 会分配新的 rowid，rowid 的顺序即最近写入的顺序
+        Db.execute("DELETE FROM files WHERE rowid NOT IN (SELECT rowid FROM files ORDER BY rowid DESC LIMIT ?)",
+                   (ResultCacheLimit,))
+        Db.execute("DELETE FROM results WHERE key NOT IN (SELECT key FROM results ORDER BY updated DESC LIMIT ?)",
+                   (ResultCacheLimit,))
+        Db.execute("INSERT OR REPLACE INTO meta VALUES ('pruned', ?)", (Now,))
+        Db.commit()
+
+    def HashFile(self, Path):
+        """文件内容的 sha256"""
+        Hasher = hashlib.sha256()
+        with open(Path, "rb") as F:
+            for Chunk in iter(lambda: F.read(1 << 20), b""):
+                Hasher.update(Chunk)
+        return Hasher.hexdigest()
+
+    def FileDigest(self, Db, Path):
+        """文件内容的哈希，以 (路径, 大小, 修改时间, inode) 记忆，文件未变化时不重新读取"""
+        Path = os.path.abspath(Path)
+        Info = os.stat(Path)
+        Stamp = (Info.st_size, Info.st_mtime_ns, Info.st_ino)
+        Row = Db.execute("SELECT digest FROM files WHERE path=? AND size=? AND mtime=? AND ino=?",
+                         (Path, *Stamp)).fetchone()
+        if Row:
+            return Row[0]
+        Digest = self.HashFile(Path)
+        Db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", (Path, *Stamp, Digest))
+        return Digest
+
+    def CachedAutoTest(self, File, ResFile, Samples, Config, Workers, Rerun=False, OnResult=None, OnCached=None):
+        """带结果缓存的自动测试：以 (程序, 输入, 答案, 限制与比较方式) 的哈希为键记忆通过的样例
         
-        self.CleanupTestFiles()
-        return Result
+        命中缓存的通过样例直接报告不再运行，OnCached 收到其缓存的CPU时间与内存；上次未通过的样例排在最前面运行。
+        只缓存通过的结果，失败的样例每次都重新运行；样例在即将运行时才计算哈希，大数据包无需先读完全部输入"""
+        Db = self.OpenResultCache()
+        try:
+            # 编译缓存中的程序文件名即为其内容键；临时目录中的程序每次都不同，直接计算哈希，不记入文件表
+            if ResFile.startswith(self.GetCacheDir("bin")):
+                Binary = os.path.basename(ResFile)
+            else:
+                Binary = self.HashFile(ResFile)
+            Limits = json.dumps([Config["时间限制"], Config["内存限制"], Config.get("比较模式", "行"),
+                                 Config.get("精度", 1e-6),
+                                 round(self.SpeedFactor(), 3) if Config.get("时间校准", 0) else 1,
+                                 os.path.basename(Config.get("交互器程序") or "")])
+            Source = os.path.abspath(File)
+            History = dict(Db.execute("SELECT num, verdict FROM history WHERE source=?", (Source,)))
 
-    def EvaluateResult(self, Num, ReturnCode, TimeExceeded, MemExceeded, 
-                      ActualList, ExpectedList, Stderr, ElapsedTime, MaxMemory, Config):
-        """统一的结果评估和输出逻辑 - OI标准"""
-        MemoryLimitMB = Config["内存限制"]
+            # 只按编号排序（不读取文件）：上次未通过的样例在前
+            Samples = list(Samples)
+            Failing = [Sample for Sample in Samples if History.get(str(Sample['Num']), 'AC') != 'AC']
+            if Failing:
+                print(f"🔁 优先运行上次未通过的 {len(Failing)} 个样例\n")
+                Samples = Failing + [Sample for Sample in Samples if History.get(str(Sample['Num']), 'AC') == 'AC']
+
+            Keys = {}
+            Cached = []
+
+            def Pending():
+                """按顺序产出需要运行的样例，命中缓存的样例就地记录并跳过"""
+                for Sample in Samples:
+                    if 'InputPath' in Sample:
+                        Input = self.FileDigest(Db, Sample['InputPath'])
+                        Answer = self.FileDigest(Db, Sample['AnswerPath'])
+                    else:
+                        Input = hashlib.sha256(Sample['Input'].encode()).hexdigest()
+                        Answer = hashlib.sha256("".join(Sample['Output']).encode()).hexdigest()
+                    Key = hashlib.sha256("\0".join([Binary, Input, Answer, Limits]).encode()).hexdigest()
+                    Keys[str(Sample['Num'])] = Key
+                    Row = None if Rerun else Db.execute(
+                        "SELECT cputime, memory FROM results WHERE key=? AND verdict='AC'", (Key,)).fetchone()
+                    if not Row:
+                        yield Sample
+                        continue
+                    Db.execute("UPDATE results SET updated=? WHERE key=?", (time.time(), Key))
+                    Cached.append((Sample['Num'], *Row))
+                    if OnCached is not None:
+                        OnCached({'Num': Sample['Num'], 'InputKey': self.InputKey(Sample),
+                                  'CpuTime': Row[0], 'MaxMemory': Row[1]})
+
+            def Record(Run):
+                Verdict = 'ERR' if Run['Error'] else self.Classify(Run, Config)
+                Now = time.time()
+                Num = str(Run['Num'])
+                Db.execute("INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?)", (Source, Num, Verdict, Now))
+                if Verdict == 'AC':
+                    Db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                               (Keys[Num], Verdict, Run['CpuTime'], Run['MaxMemory'], Now))
+                else:
+                    Db.execute("DELETE FROM results WHERE key=?", (Keys[Num],))
+                Db.commit()
+                if OnResult is not None:
+                    OnResult(Run)
+
+            PassedCount, TotalCount = self.ParallelAutoTest(ResFile, Pending(), Config, Workers, OnResult=Record)
+            Db.commit()
+            if Cached:
+                Slowest = max(Cached, key=lambda Item: Item[1])
+                Nums = ", ".join(str(Num) for Num, _, _ in Cached[:10]) + (" ..." if len(Cached) > 10 else "")
+                print(f"⚡ {len(Cached)} 个样例命中结果缓存，此前均已通过: {Nums}")
+                print(f"   最慢: 样例 {Slowest[0]}  ⏱️ {Slowest[1]:.0f}ms    "
+                      f"💾 {max(Memory for _, _, Memory in Cached)/1024/1024:.1f}MB（使用 --rerun 强制重新运行）")
+            self.PruneResultCache(Db)
+            return PassedCount + len(Cached), TotalCount + len(Cached)
+        finally:
+            Db.close()
+
+    def Summarize(self, Values):
+        """计算一组测量值的 最小值/中位数/p95/平均值/标准差"""
+        Ordered = sorted(Values)
+        # p95 使用最近秩法
+        P95 = Ordered[max(0, -(-len(Ordered) * 95 // 100) - 1)]
+        return {
+            "min": Ordered[0],
+            "median": statistics.median(Ordered),
+            "p95": P95,
+            "mean": statistics.fmean(Ordered),
+            "stdev": statistics.pstdev(Ordered),
+        }
+
+    def BenchmarkTest(self, File, ResFile, Samples, Config, Repeat, Warmup=1, Pin=False):
+        """基准测试：每个样例先预热 Warmup 次，再测量 Repeat 次，以CPU时间中位数判定时间超限
+        
+        样例逐个串行运行以减少相互干扰；结果追加到 <源文件>.bench.jsonl 便于长期跟踪"""
         TimeLimitMS = Config["时间限制"]
+        MemoryLimitMB = Config["内存限制"]
+        # 绑定到允许集合中的最后一个CPU（通常离系统中断处理较远）
+        Cpu = sorted(os.sched_getaffinity(0))[-1] if Pin else None
+        Records = []
+        PassedCount = TotalCount = 0
+        for Sample in Samples:
+            Num = Sample['Num']
+            TotalCount += 1
+            WorkDir = self.CreateWorkDir()
+            try:
+                InPath, OutPath, AnsPath = self.PrepareSample(Sample, WorkDir)
+                Runs = []
+                for I in range(Warmup + Repeat):
+                    Result = self.Execute([os.path.abspath(ResFile)], WorkDir, Config, Cpu,
+                                          Stdin=InPath, Stdout=OutPath)
+                    if Result['Error']:
+                        break
+                    # 运行错误或远超时限（被强制终止）时不必继续重复，该次结果直接计入
+                    Stop = (Result['ReturnCode'] != 0 and not Result['TimeExceeded']) or \
+                        Result['WallExceeded'] or Result['ReturnCode'] == -signal.SIGXCPU
+                    if I >= Warmup or Stop:
+                        Runs.append(Result)
+                    if Stop:
+                        break
+                if not Runs:
+                    print(f"❌ 样例 {Num} 程序启动失败: {Result['Error']}")
+                    continue
+                CpuStats = self.Summarize([R['CpuTime'] for R in Runs])
+                WallStats = self.Summarize([R['WallTime'] for R in Runs])
+                Memory = max(R['MaxMemory'] for R in Runs)
+                # 以中位数作为稳健统计量判定时间，正确性以第一次测量的输出为准
+                First = dict(Runs[0], Mismatch=None)
+                if First['ReturnCode'] == 0 and not First['TimeExceeded'] and not First['MemExceeded']:
+                    First['Mismatch'] = self.Check(OutPath, AnsPath, Config)
+                First['TimeExceeded'] = CpuStats["median"] > TimeLimitMS or any(R['WallExceeded'] for R in Runs)
+                Verdict = self.Classify(First, Config)
+            finally:
+                self.CleanupTestFiles(WorkDir)
+
+            Icon = "✅" if Verdict == 'AC' else "❌"
+            print(f"{Icon} 样例 {Num} {Verdict}  ({len(Runs)} 次测量, 预热 {Warmup} 次)")
+            print(f"⏱️ CPU: 最小 {CpuStats['min']:.1f}ms  中位 {CpuStats['median']:.1f}ms  p95 {CpuStats['p95']:.1f}ms  "
+                  f"σ {CpuStats['stdev']:.2f}ms / {TimeLimitMS}ms")
+            print(f"🕒 墙钟: 最小 {WallStats['min']:.1f}ms  中位 {WallStats['median']:.1f}ms  p95 {WallStats['p95']:.1f}ms  "
+                  f"σ {WallStats['stdev']:.2f}ms    💾 内存: {Memory/1024/1024:.1f}MB / {MemoryLimitMB}MB")
+            if Verdict == 'AC':
+                PassedCount += 1
+            Records.append({"num": Num, "verdict": Verdict, "runs": len(Runs),
+                            "cpu_ms": CpuStats, "wall_ms": WallStats, "memory_bytes": Memory})
+
+        with open(File, "rb") as F:
+            SourceHash = hashlib.sha256(F.read()).hexdigest()
+        Record = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "file": os.path.abspath(File),
+            "source_sha256": SourceHash,
+            "binary": os.path.basename(ResFile),
+            "repeat": Repeat,
+            "warmup": Warmup,
+            "pinned_cpu": Cpu,
+            "time_limit_ms": TimeLimitMS,
+            "samples": Records,
+        }
+        BenchPath = os.path.splitext(File)[0] + ".bench.jsonl"
+        with open(BenchPath, "a", encoding="utf-8") as F:
+            F.write(json.dumps(Record, ensure_ascii=False) + "\n")
+        print(f"📈 基准数据已追加到: {BenchPath}")
+        return PassedCount, TotalCount
+
+    def ShowResult(self, Result, Run, Config):
+        """按评测记录输出单个样例的结果 - OI标准
         
-        # 判断程序执行状态
-        if TimeExceeded:
+        Run 为对应的运行结果，用于输出差异、完整的调试信息、性能计数器（"性能计数器"模式）与交互器的资源使用"""
+        MemoryLimitMB = Config["内存限制"]
+        TimeLimitMS = Config["时间限制"]
+        Num = Result.Num
+        Interactor = Run.get('Interactor')
+        Stderr = Run.get('Stderr')
+
+        def ShowUsage():
+            print(f"⏱️ 时间: {Result.CpuTime:.0f}ms / {TimeLimitMS}ms    "
+                  f"💾 内存: {Result.Memory/1024/1024:.1f}MB / {MemoryLimitMB}MB")
+            if Interactor is not None:
+                print(f"🔁 交互器: {Interactor['CpuTime']:.0f}ms    💾 {Interactor['MaxMemory']/1024/1024:.1f}MB    "
+                      f"🕒 墙钟: {Interactor['WallTime']:.0f}ms")
+            if Config.get("性能计数器", 0):
+                self.ShowCounters(Run)
+
+        def ShowStderr():
+            if Stderr and Stderr.strip():
+                print("—— 调试信息 ——")
+                print(Stderr.strip())
+
+        if Result.Verdict == "ERR":
+            print(f"❌ 样例 {Num} {Result.Error}")
+            return
+        if Result.Verdict == "TLE":
             print(f"❌⏰ 样例 {Num} 时间超限 (>{TimeLimitMS}ms)")
-            print(f"⏱️ 时间: {ElapsedTime:.0f}ms / {TimeLimitMS}ms    "
-                  f"💾 内存: {MaxMemory/1024/1024:.1f}MB / {MemoryLimitMB}MB")
-            return False
-        elif MemExceeded:
+            ShowUsage()
+            return
+        if Result.Verdict == "MLE" and Result.Signal != signal.SIGABRT:
             print(f"❌💾 样例 {Num} 内存超限 (>{MemoryLimitMB}MB)")
-            print(f"⏱️ 时间: {ElapsedTime:.0f}ms / {TimeLimitMS}ms    "
-                  f"💾 内存: {MaxMemory/1024/1024:.1f}MB / {MemoryLimitMB}MB")
-            return False
-        elif ReturnCode != 0:
-            if ReturnCode == -signal.SIGKILL:
+            ShowUsage()
+            return
+        if Result.Verdict in ("MLE", "RE"):
+            if Result.Verdict == "MLE":
+                # 内存分配失败导致的异常（失败的分配不会计入峰值内存）
+                print(f"❌💾 样例 {Num} 内存分配失败 (可能超限)")
+            elif Result.Signal == signal.SIGKILL:
                 print(f"❌💾 样例 {Num} 被系统终止 (可能内存超限)")
-            elif ReturnCode == -signal.SIGSEGV:
+            elif Result.Signal == signal.SIGSEGV:
                 print(f"❌💥 样例 {Num} 段错误 (访问违法内存)")
-            elif ReturnCode == -signal.SIGFPE:
+            elif Result.Signal == signal.SIGFPE:
                 print(f"❌ 样例 {Num} 浮点异常 (除零错误)")
-            elif ReturnCode == -signal.SIGABRT:
-                # 检查是否为内存分配失败导致的异常
-                if MaxMemory / (1024 * 1024) > MemoryLimitMB * 0.8:  # 接近限制时认为是内存问题
-                    print(f"❌💾 样例 {Num} 内存分配失败 (可能超限)")
-                else:
-                    print(f"❌💥 样例 {Num} 程序异常终止 (SIGABRT)")
+            elif Result.Signal == signal.SIGABRT:
+                print(f"❌💥 样例 {Num} 程序异常终止 (SIGABRT)")
             else:
-                print(f"❌💥 样例 {Num} 运行时错误 (退出码: {ReturnCode})")
-            
-            # 显示性能信息
-            print(f"⏱️ 时间: {ElapsedTime:.0f}ms / {TimeLimitMS}ms    "
-                  f"💾 内存: {MaxMemory/1024/1024:.1f}MB / {MemoryLimitMB}MB")
-            return False
+                print(f"❌💥 样例 {Num} 运行时错误 (退出码: {Run['ReturnCode']})")
+            ShowUsage()
+            ShowStderr()
+            return
+
+        # 检查输出正确性（比较已在运行样例时流式完成）
+        if Result.Verdict == "WA" and Result.Message:
+            print(f"❌ 样例 {Num} 答案错误 (交互器: {Result.Message})")
+        elif Result.Verdict == "WA":
+            print(f"❌ 样例 {Num} 答案错误 (第 {Result.Mismatch[0]} 行第 {Result.Mismatch[1]} 列)")
+            self.ShowDiff(Run['AnsPath'], Run['OutPath'], Config, Result.Mismatch)
         else:
-            # 检查输出正确性
-            Passed = self.Check(ActualList, ExpectedList, Config)
-            if not Passed:
-                print(f"❌ 样例 {Num} 答案错误")
-                self.ShowDiff(ExpectedList, ActualList)
-            else:
-                print(f"✅ 样例 {Num} 通过")
-                
-            # 显示性能信息
-            print(f"⏱️ 时间: {ElapsedTime:.0f}ms / {TimeLimitMS}ms    "
-                  f"💾 内存: {MaxMemory/1024/1024:.1f}MB / {MemoryLimitMB}MB")
-            
-            # 显示调试信息（如果有）
-            if Stderr and Stderr.strip():
-                print("—— 调试信息 ——")
-                print(Stderr.strip())
-            
-            return Passed
+            print(f"✅ 样例 {Num} 通过")
+        ShowUsage()
+        ShowStderr()
 
-        # 对于运行时错误，也显示调试信息
-        if Stderr and Stderr.strip():
-            print("—— 调试信息 ——")
-            print(Stderr.strip())
-            
-        return False
+    def ShowCounters(self, Run):
+        """输出硬件性能计数器与缺页/上下文切换次数，计数器不可用时只输出 rusage 部分"""
+        def Human(Value):
+            for Unit, Scale in (("G", 1e9), ("M", 1e6), ("K", 1e3)):
+                if Value >= Scale:
+                    return f"{Value / Scale:.2f}{Unit}"
+            return str(Value)
+
+        Parts = []
+        Counters = Run.get('Counters') or {}
+        Instructions, Cycles = Counters.get('Instructions'), Counters.get('Cycles')
+        if Instructions is not None:
+            Parts.append(f"指令: {Human(Instructions)}")
+        if Cycles is not None:
+            Parts.append(f"周期: {Human(Cycles)}")
+        if Instructions is not None and Cycles:
+            Parts.append(f"IPC: {Instructions / Cycles:.2f}")
+        for Name, Key in (("缓存未命中", 'CacheMisses'), ("分支未命中", 'BranchMisses')):
+            if Counters.get(Key) is not None:
+                Parts.append(f"{Name}: {Human(Counters[Key])}")
+        if not Parts:
+            Parts.append("硬件计数器不可用")
+        Parts.append(f"缺页: {Run['MinorFaults']}/{Run['MajorFaults']}")
+        Parts.append(f"上下文切换: {Run['VoluntarySwitches']}/{Run['InvoluntarySwitches']}")
+        print("📈 " + "    ".join(Parts))
+
+    def SkipLines(self, F, Count):
+        """按块跳过文件的前 Count 行（不逐行解码），返回实际跳过的行数"""
+        Skipped = 0
+        while Skipped < Count:
+            Pos = F.tell()
+            Chunk = F.read(1 << 20)
+            if not Chunk:
+                break
+            Newlines = Chunk.count(b"\n")
+            if Skipped + Newlines < Count:
+                Skipped += Newlines
+                continue
+            Index = -1
+            for _ in range(Count - Skipped):
+                Index = Chunk.index(b"\n", Index + 1)
+            F.seek(Pos + Index + 1)
+            Skipped = Count
+        return Skipped
+
+    def CountLines(self, F):
+        """按块统计文件剩余部分的行数（末尾没有换行的最后一行也计入）"""
+        Count = 0
+        Last = b"\n"
+        for Chunk in iter(lambda: F.read(1 << 20), b""):
+            Count += Chunk.count(b"\n")
+            Last = Chunk[-1:]
+        return Count + (Last != b"\n")
+
+    def ShowDiff(self, AnsPath, OutPath, Config=None, Mismatch=None):
+        """流式显示期望输出与实际输出的差异：只显示前 "差异数量" 处不一致的行（默认3），
+        每处附带 "差异上下文" 行上下文（默认2），最后汇总两边的行数
+        
+        两个文件逐行读取，显示完毕即停止比较；已知首个不一致的行号时直接按块跳到附近"""
+        Config = Config or {}
+        Limit = max(1, Config.get("差异数量", 3))
+        Context = max(0, Config.get("差异上下文", 2))
+        Mode = Config.get("比较模式", "行")
+        Eps = float(Config.get("精度", 1e-6)) if Mode == "浮点" else None
+
+        def Equal(Ans, Out):
+            if Mode == "行":
+                return Ans.rstrip() == Out.rstrip()
+            AnsTokens, OutTokens = Ans.split(), Out.split()
+            return len(AnsTokens) == len(OutTokens) and all(
+                self.TokensEqual(X, Y, Eps) for X, Y in zip(OutTokens, AnsTokens))
+
+        def Columns(AnsText, OutText):
+            """不一致位置在两行中的列号：行模式为第一个不同的字符，词/浮点模式为第一个不同的词的开头，与 Check 一致"""
+            if Mode == "行":
+                Col = next((I for I, (X, Y) in enumerate(zip(AnsText, OutText)) if X != Y),
+                           min(len(AnsText), len(OutText)))
+                Col = len(AnsText[:Col].decode("utf-8", errors="replace")) + 1
+                return Col, Col
+            AnsTokens, OutTokens = AnsText.split(), OutText.split()
+            Index = next((I for I, (X, Y) in enumerate(zip(OutTokens, AnsTokens)) if not self.TokensEqual(X, Y, Eps)),
+                         min(len(AnsTokens), len(OutTokens)))
+            Result = []
+            for Text, Tokens in ((AnsText, AnsTokens), (OutText, OutTokens)):
+                Pos = 0
+                for Token in Tokens[:Index]:
+                    Pos = Text.index(Token, Pos) + len(Token)
+                # 词数不足时指向行末
+                Pos = Text.index(Tokens[Index], Pos) if Index < len(Tokens) else len(Text.rstrip())
+                Result.append(len(Text[:Pos].decode("utf-8", errors="replace")) + 1)
+            return tuple(Result)
+
+        def Show(No, Mark, Line, Col=None):
+            Text = Line.decode("utf-8", errors="replace").rstrip("\r\n") if Line else None
+            if Text is None:
+                print(f"{No:>6}│{Mark}<无此行>")
+                return
+            # 过长的行只显示第一个不同字符附近的片段
+            Begin = max(0, (Col or 1) - 40) if len(Text) > 120 else 0
+            Shown = ("…" if Begin else "") + Text[Begin:Begin + 120] + ("…" if len(Text) > Begin + 120 else "")
+            print(f"{No:>6}│{Mark}{Shown!r}" + (f"  (第 {Col} 列)" if Col and Mark == "+" else ""))
+
+        try:
+            Out = open(OutPath, "rb")
+        except FileNotFoundError:
+            Out = open(os.devnull, "rb")
+        with open(AnsPath, "rb") as Ans, Out:
+            Start = 1
+            if Mismatch is not None and Mode == "行":
+                Start = max(1, Mismatch[0] - Context)
+            AnsLines = self.SkipLines(Ans, Start - 1)
+            OutLines = self.SkipLines(Out, Start - 1)
 
-    def ShowDiff(self, ExpectedList, ActualList):
-        """显示期望输出与实际输出的差异"""
-        print("—— 期望输出 ——")
-        for I, Line in enumerate(ExpectedList, 1):
-            print(f"{I:2d}│{repr(Line)}")
-        print("—— 实际输出 ——") 
-        for I, Line in enumerate(ActualList, 1):
-            print(f"{I:2d}│{repr(Line)}")
-        print("—————————————")
+            print(f"—— 差异（- 期望 / + 实际，最多显示 {Limit} 处）——")
+            Before = deque(maxlen=Context)
+            Shown = After = 0
+            LastPrinted = 0
+            More = False
+            LineNo = Start - 1
+            while True:
+                AnsLine, OutLine = Ans.readline(), Out.readline()
+                if not AnsLine and not OutLine:
+                    break
+                LineNo += 1
+                AnsLines += bool(AnsLine)
+                OutLines += bool(OutLine)
+                if AnsLine and OutLine and Equal(AnsLine, OutLine):
+                    if After:
+                        Show(LineNo, " ", AnsLine)
+                        LastPrinted = LineNo
+                        After -= 1
+                    elif Shown >= Limit:
+                        break
+                    else:
+                        Before.append((LineNo, AnsLine))
+                    continue
+                if Shown >= Limit:
+                    More = True
+                    break
+                First = Before[0][0] if Before else LineNo
+                if First > LastPrinted + 1 and (LastPrinted or First > 1):
+                    print("     ⋯")
+                for No, Line in Before:
+                    Show(No, " ", Line)
+                Before.clear()
+                AnsCol, OutCol = Columns(AnsLine.rstrip(b"\r\n"), OutLine.rstrip(b"\r\n"))
+                Show(LineNo, "-", AnsLine, AnsCol)
+                Show(LineNo, "+", OutLine, OutCol if AnsLine and OutLine else None)
+                Shown += 1
+                After = Context
+                LastPrinted = LineNo
+
+            AnsLines += self.CountLines(Ans)
+            OutLines += self.CountLines(Out)
+        if More:
+            print(f"     ⋯ 后面还有不一致，仅显示前 {Limit} 处")
+        if AnsLines != OutLines:
+            Diff = OutLines - AnsLines
+            print(f"—— 期望 {AnsLines} 行，实际 {OutLines} 行（{'多' if Diff > 0 else '少'} {abs(Diff)} 行）——")
+        else:
+            print(f"—— 期望与实际均为 {AnsLines} 行 ——")
 
     def ManualTest(self, ResFile, TestNum, Config):
         """使用文件I/O运行手动测试 - OI风格"""
@@ -375,62 +2048,65 @@ signed main() {{
         InputText = '\n'.join(InputData)
         if InputText and not InputText.endswith('\n'):
             InputText += '\n'
-        
-        TimeLimit = Config["时间限制"] / 1000.0
-        MemoryLimit = Config["内存限制"] * 1024 * 1024
-
-        def SetResourceLimits():
-            """设置资源限制 - 与AutoTest保持一致"""
-            resource.setrlimit(resource.RLIMIT_AS, (MemoryLimit, MemoryLimit))
-            resource.setrlimit(resource.RLIMIT_DATA, (MemoryLimit, MemoryLimit))
-            CpuTimeLimit = int(TimeLimit * 1.2)
-            resource.setrlimit(resource.RLIMIT_CPU, (CpuTimeLimit, CpuTimeLimit))
+        return self.RunInput(ResFile, InputText, TestNum, Config)
 
-        # 写入测试输入文件
+    def RunInput(self, ResFile, InputText, TestNum, Config):
+        """以给定输入运行一次程序并输出结果，手动测试与 Run 命令共用"""
+        # 写入测试输入文件（使用独立的工作目录）
+        WorkDir = self.CreateWorkDir()
+        InPath = os.path.join(WorkDir, "test.in")
         try:
-            with open("test.in", "w", encoding="utf-8") as F:
+            with open(InPath, "w", encoding="utf-8") as F:
                 F.write(InputText)
         except IOError as E:
             print(f"❌ 无法写入测试文件: {E}")
+            self.CleanupTestFiles(WorkDir)
             return False
 
-        # 运行程序
-        StartTime = time.perf_counter()
-        try:
-            Result = subprocess.run(
-                [os.path.abspath(ResFile)],
-                stderr=subprocess.PIPE,
-                stdout=subprocess.DEVNULL,  # 输出重定向到文件
-                stdin=subprocess.DEVNULL,   # 输入来自文件
-                text=True,
-                timeout=TimeLimit,
-                preexec_fn=SetResourceLimits
-            )
-        except subprocess.TimeoutExpired:
-            print(f"❌⏰ 程序运行超时 (>{Config['时间限制']}ms)")
-            self.CleanupTestFiles()
+        # 运行程序（与AutoTest共用资源统计后端），未使用 freopen 的程序同样从 test.in 读、向 test.out 写
+        Result = self.Execute([os.path.abspath(ResFile)], WorkDir, Config,
+                              Stdin=InPath, Stdout=os.path.join(WorkDir, "test.out"))
+        if Result['Error']:
+            print(f"❌ 程序启动失败: {Result['Error']}")
+            self.CleanupTestFiles(WorkDir)
             return False
-        except OSError as E:
-            print(f"❌ 程序启动失败: {E}")
-            self.CleanupTestFiles()
+        if Result['TimeExceeded']:
+            print(f"❌⏰ 程序运行超时 (>{Config['时间限制']}ms)")
+            self.CleanupTestFiles(WorkDir)
             return False
-            
-        ElapsedTime = (time.perf_counter() - StartTime) * 1000
-        
-        # 获取内存使用信息（简化版本）
-        Usage = resource.getrusage(resource.RUSAGE_CHILDREN)
-        MaxMemory = Usage.ru_maxrss * 1024  # Linux上是KB，转换为字节
 
         # 评估运行结果
         Success = self.EvaluateManualResult(
-            TestNum, Result.returncode, ElapsedTime, MaxMemory, 
-            Result.stderr, Config
+            TestNum, Result['ReturnCode'], Result['CpuTime'], Result['MaxMemory'],
+            Result['Stderr'], Config, WorkDir
         )
         
-        self.CleanupTestFiles()
+        self.CleanupTestFiles(WorkDir)
         return Success
 
-    def EvaluateManualResult(self, TestNum, ReturnCode, ElapsedTime, MaxMemory, Stderr, Config):
+    def RunOnce(self, File, InputPath=None):
+        """编译源文件并以输入文件（默认标准输入）运行一次"""
+        if not os.path.exists(File):
+            print(f"❌ 文件不存在: {File}")
+            return False
+        Config = self.LoadConfig(File, DefaultConfig)
+        ResFile, Hit, Output = self.Compile(File, Config, UseCache=Config.get("编译缓存", 1) != 0)
+        if ResFile is None:
+            print("❌ 编译失败:")
+            if Output:
+                print(Output)
+            return False
+        if InputPath is not None:
+            with open(InputPath, "r", encoding="utf-8") as F:
+                InputText = F.read()
+        else:
+            InputText = sys.stdin.read()
+        try:
+            return self.RunInput(ResFile, InputText, 1, Config)
+        finally:
+            self.ReleaseBinary(ResFile)
+
+    def EvaluateManualResult(self, TestNum, ReturnCode, ElapsedTime, MaxMemory, Stderr, Config, WorkDir="."):
         """评估手动测试结果"""
         TimeLimitMS = Config["时间限制"]
         MemoryLimitMB = Config["内存限制"]
@@ -450,7 +2126,7 @@ signed main() {{
 
         # 显示程序输出
         try:
-            with open("test.out", "r", encoding="utf-8") as F:
+            with open(os.path.join(WorkDir, "test.out"), "r", encoding="utf-8") as F:
                 Output = F.read()
             if Output:
                 print("—— 程序输出 ——")
@@ -473,83 +2149,1562 @@ signed main() {{
         
         return ReturnCode == 0
 
-    def CleanupTestFiles(self):
-        """清理测试文件"""
-        TestFiles = ["test.in", "test.out", "test.ans"]
-        for FileName in TestFiles:
-            try:
-                os.remove(FileName)
-            except FileNotFoundError:
-                pass
-    
-    def MemorySafetyCheck(self, ExeFile, TestCount, Samples, Config):
-        """使用调试版本进行内存安全检查"""
-        MemoryLimit = Config["内存限制"]
-        CheckCount = min(TestCount, 3)  # 最多检查前3个样例
-        
-        for I in range(CheckCount):
-            Sample = Samples[I]
-            SampleNum = Sample["Num"]
-            
-            # 创建测试输入文件
-            with open("test.in", "w", encoding="utf-8") as F:
-                F.write(Sample["Input"])
-            
-            # 执行程序并监控内存
-            MemorySafe = self.AutoTest(ExeFile, Sample, Config, SafetyCheckMode=True)
-            
-            if not MemorySafe:
-                print(f"⚠️ 样例 {SampleNum} 内存安全检查失败")
-                return False
-                
-        print(f"✅ 已检查 {CheckCount} 个样例，内存使用安全")
+    def CreateWorkDir(self):
+        """为单次运行创建私有的临时工作目录"""
+        return tempfile.mkdtemp(prefix="oitools-")
+
+    def CleanupTestFiles(self, WorkDir):
+        """清理测试文件（整个临时工作目录）"""
+        shutil.rmtree(WorkDir, ignore_errors=True)
+
+    def ReleaseBinary(self, ResFile):
+        """清理编译生成的程序：编译缓存中的程序保留，其余删除所在的临时目录，返回是否清理"""
+        if not ResFile or ResFile.startswith(self.GetCacheDir("bin")):
+            return False
+        self.CleanupTestFiles(os.path.dirname(ResFile))
         return True
+    
+    def MemorySafetyCheck(self, File, Samples, Config, Workers=1):
+        """后台内存安全检查：在独立线程中编译 ASan+UBSan 版本，编译完成后由后台工作线程运行全部样例
+        
+        立即返回，不阻塞正式版本的编译与判定；返回的 Collect() 等待检查结束并返回
+        (未能检查时的原因或None, {样例编号: 发现的问题列表})，编译失败或后台线程出错都只跳过检查"""
+        Pool = ThreadPoolExecutor(max_workers=max(1, Workers))
+        Runs = []
+        Build = {'ResFile': None, 'Error': None}
 
-    def Test(self, File):
-        """编译并运行测试"""
-        print(f"🔧 加载文件: {File}")
-        if not os.path.exists(File):
-            print(f"❌ 文件不存在: {File}")
+        def Builder():
+            try:
+                ResFile, _, Output = self.Compile(File, Config, UseCache=Config.get("编译缓存", 1) != 0,
+                                                  Sanitize=True)
+                Build['ResFile'] = ResFile
+                if ResFile is None:
+                    Build['Error'] = f"消毒版本编译失败:\n{Output or ''}".rstrip()
+                    return
+                Runs.extend((Sample['Num'], Pool.submit(self.SanitizerRun, ResFile, Sample, Config))
+                            for Sample in Samples)
+            except Exception as E:
+                Build['Error'] = f"后台线程出错: {E}"
+
+        Thread = threading.Thread(target=Builder, daemon=True)
+        Thread.start()
+
+        def Outcome(Future):
+            try:
+                return Future.result()
+            except Exception as E:
+                return [f"消毒检查出错: {E}"]
+
+        def Collect():
+            Thread.join()
+            try:
+                if Build['Error'] is not None:
+                    for _, Future in Runs:
+                        Future.cancel()
+                    return Build['Error'], {}
+                return None, {Num: Outcome(Future) for Num, Future in Runs}
+            finally:
+                Pool.shutdown()
+                self.ReleaseBinary(Build['ResFile'])
+        return Collect
+
+    def ShowSanitizerReport(self, BuildError, Findings):
+        """输出后台消毒检查的结果，按样例列出问题"""
+        print("\n🧪 消毒检查（ASan + UBSan）")
+        if BuildError is not None:
+            print(f"⚠️ 已跳过消毒检查: {BuildError}")
             return
-        Config, Samples = self.Getonfig(File)
-        if Config is None:
-            print("❌ 无法解析配置，自动尝试默认模式\nC++版本: C++17\n优化等级: -O2\n时间限制: 2000ms\n内存限制: 256MB")
-            Config = {"自动测试": 0, "C++版本": "C++17", "优化等级": "-O2", "时间限制": 2000, "内存限制": 256}
-            Samples = []
+        Clean = 0
+        for Num, Items in Findings.items():
+            if not Items:
+                Clean += 1
+                continue
+            print(f"⚠️ 样例 {Num}:")
+            for Item in Items:
+                print(f"   {Item}")
+        if Clean == len(Findings):
+            print(f"✅ {Clean} 个样例均未发现内存或未定义行为问题")
+        elif Clean:
+            print(f"✅ 其余 {Clean} 个样例未发现问题")
 
-        print(f"🔧 编译文件: {File}")
-        ResFile = File.replace('.cpp', '') + '.app'
-        # 根据配置构建编译命令
-        CompileCMD = ['g++', '-o', ResFile, File]
-        CompileCMD.append(f'-std={Config.get("C++版本", "C++17").lower().replace("c++", "c++")}')
+    def SanitizerRun(self, ResFile, Sample, Config):
+        """用消毒版本运行单个样例，返回 ASan/UBSan 报告的问题（没有问题时为空列表）
         
-        # 添加DEBUG宏定义
-        CompileCMD.append('-DDEBUG')
+        ASan 的影子内存使虚拟地址空间远大于实际占用，因此不设 RLIMIT_AS，
+        改由 hard_rss_limit_mb 按 3 倍内存限制兜底；运行速度约慢2-3倍，时间限制同样放宽到3倍"""
+        MemoryLimitMB = Config["内存限制"]
+        SanConfig = dict(Config, **{"时间限制": Config["时间限制"] * 3})
+        Env = dict(os.environ,
+                   ASAN_OPTIONS=f"detect_leaks=0:hard_rss_limit_mb={MemoryLimitMB * 3 + 512}",
+                   UBSAN_OPTIONS="print_stacktrace=0:print_summary=1")
+        WorkDir = self.CreateWorkDir()
+        try:
+            InPath, _, _ = self.PrepareSample(Sample, WorkDir)
+            Result = self.Execute([os.path.abspath(ResFile)], WorkDir, SanConfig, Stdin=InPath,
+                                  Env=Env, Sanitized=True)
+        except IOError as E:
+            return [f"样例文件写入失败: {E}"]
+        finally:
+            self.CleanupTestFiles(WorkDir)
+        if Result['Error']:
+            return [f"消毒版本启动失败: {Result['Error']}"]
+        Findings = []
+        Errors = []
+        for Line in Result['Stderr'].splitlines():
+            Line = Line.strip()
+            if ("runtime error:" in Line or Line.startswith("SUMMARY:")) and Line not in Findings:
+                Findings.append(Line)
+            elif "ERROR: AddressSanitizer" in Line:
+                Errors.append(Line)
+        # SUMMARY 已包含错误类型与位置，没有 SUMMARY 时（如 RSS 超限）才使用 ERROR 行
+        Findings = Findings or Errors
+        if Result['TimeExceeded'] and not Findings:
+            Findings.append(f"消毒版本运行超时（>{SanConfig['时间限制']}ms），未完成检查")
+        return Findings[:5]
+
+    def GetCacheDir(self, Name):
+        """获取持久缓存目录（$OITOOLS_CACHE 或 ~/.cache/oitools 下的子目录）"""
+        Path = os.path.join(CacheBase(), Name)
+        os.makedirs(Path, exist_ok=True)
+        return Path
+
+    def CompilerVersion(self):
+        """获取编译器版本标识（版本输出 + 可执行文件路径与修改时间），用作缓存键的一部分"""
+        if getattr(self, "_CompilerVersion", None) is None:
+            Result = subprocess.run(['g++', '--version'], capture_output=True, text=True)
+            Path = shutil.which('g++') or 'g++'
+            try:
+                Stat = os.stat(os.path.realpath(Path))
+                Stamp = f"{os.path.realpath(Path)}:{Stat.st_mtime_ns}:{Stat.st_size}"
+            except OSError:
+                Stamp = Path
+            self._CompilerVersion = Result.stdout.strip() + "\n" + Stamp
+        return self._CompilerVersion
+
+    def BuildCompileFlags(self, Config, Debug=True, Sanitize=False):
+        """根据配置构建编译参数（不含输入输出文件），Sanitize 为真时构建 ASan+UBSan 版本"""
+        Flags = [f'-std={Config.get("C++版本", "C++17").lower().replace("c++", "c++")}']
+
+        # 添加DEBUG宏定义（数据生成器等直接使用标准输入输出的程序不定义）
+        if Debug:
+            Flags.append('-DDEBUG')
 
         # 添加优化等级参数
         Opt = Config.get("优化等级", "-O2")
         if Opt and Opt.startswith('-O'):
-            CompileCMD.append(Opt)
+            Flags.append(Opt)
+        if Sanitize:
+            Flags += ['-fsanitize=address,undefined', '-fno-omit-frame-pointer', '-g']
+        return Flags
+
+    def Compile(self, File, Config, UseCache=True, Debug=True, Sanitize=False):
+        """编译源文件，返回 (可执行文件路径或None, 是否命中缓存, 编译器输出)
+        
+        缓存键为 预处理后源码 + 编译器版本 + 编译参数 的哈希，
+        只修改注释（如样例块）时预处理结果不变，可直接复用已编译的程序"""
+        Flags = self.BuildCompileFlags(Config, Debug, Sanitize)
+        CacheDir = self.GetCacheDir("bin")
+        Key = None
+        # 进程内记忆：源文件及其本地头文件未变化时连预处理也跳过（守护进程中重复测试只需几毫秒）
+        Memo = self.__dict__.setdefault("_CompileMemo", {})
+        MemoKey = (os.path.abspath(File), tuple(Flags))
+        Stamp = self.SourceStamp(File)
+        if (UseCache and Stamp is not None and MemoKey in Memo and Memo[MemoKey][0] == Stamp
+                and os.path.exists(Memo[MemoKey][1])):
+            os.utime(Memo[MemoKey][1])
+            self.UpdateCacheStats(Hit=True)
+            return Memo[MemoKey][1], True, ""
+        if UseCache:
+            # -P 去掉行号标记，注释增删导致的行号变化不影响缓存命中
+            Pre = subprocess.run(['g++', '-E', '-P', *Flags, File], capture_output=True)
+            if Pre.returncode == 0:
+                Hasher = hashlib.sha256()
+                Hasher.update(self.CompilerVersion().encode())
+                Hasher.update("\0".join(Flags).encode())
+                Hasher.update(b"\0")
+                Hasher.update(Pre.stdout)
+                Key = Hasher.hexdigest()
+                Cached = os.path.join(CacheDir, Key + ".app")
+                if os.path.exists(Cached):
+                    # 刷新修改时间，作为LRU淘汰的依据
+                    os.utime(Cached)
+                    self.UpdateCacheStats(Hit=True)
+                    Memo[MemoKey] = (Stamp, Cached)
+                    return Cached, True, ""
 
-        result = subprocess.run(CompileCMD, capture_output=True, text=True)
+        if Key is None:
+            # 不使用缓存（或预处理失败）时编译到私有目录，错误信息由正式编译给出
+            ResFile = os.path.join(self.CreateWorkDir(), os.path.basename(File).replace('.cpp', '') + '.app')
+        else:
+            ResFile = os.path.join(CacheDir, f"{Key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        # 预编译头只影响编译速度，不影响生成结果，因此不参与缓存键
+        PchFlags = []
+        if Config.get("预编译头", 1) != 0:
+            PchDir = self.EnsurePch(File, Flags)
+            if PchDir is not None:
+                PchFlags = ['-I', PchDir]
+        result = subprocess.run(['g++', '-o', ResFile, File, *PchFlags, *Flags], capture_output=True, text=True)
+        Output = "\n".join(Text for Text in (result.stdout.strip(), result.stderr.strip()) if Text)
         if result.returncode != 0:
-            print("❌ 编译失败:")
-            if result.stdout.strip():
-                print(result.stdout)
-            if result.stderr.strip():
-                print(result.stderr)
             try:
                 os.remove(ResFile)
-            except Exception as e:
+            except OSError:
+                pass
+            return None, False, Output
+        if Key is None:
+            return ResFile, False, Output
+
+        # 原子替换，多个实例同时编译同一份代码也不会读到半成品
+        Cached = os.path.join(CacheDir, Key + ".app")
+        os.replace(ResFile, Cached)
+        Memo[MemoKey] = (Stamp, Cached)
+        self.UpdateCacheStats(Hit=False)
+        self.EvictCompileCache(Config.get("编译缓存大小", 1024) * 1024 * 1024)
+        return Cached, False, Output
+
+    def SourceStamp(self, File):
+        """源文件及其直接包含的本地头文件（#include "..."）的 (修改时间, 大小)"""
+        Stamps = []
+        try:
+            Info = os.stat(File)
+            Stamps.append((File, Info.st_mtime_ns, Info.st_size))
+            with open(File, 'rb') as F:
+                Headers = re.findall(rb'^\s*#\s*include\s*"([^"]+)"', F.read(), re.MULTILINE)
+        except OSError:
+            return None
+        for Header in Headers:
+            Path = os.path.join(os.path.dirname(os.path.abspath(File)), os.fsdecode(Header))
+            try:
+                Info = os.stat(Path)
+                Stamps.append((Path, Info.st_mtime_ns, Info.st_size))
+            except OSError:
+                Stamps.append((Path, None, None))
+        return tuple(Stamps)
+
+    def FirstSystemHeader(self, File):
+        """返回源文件中位于所有代码之前的第一个 #include <...> 头文件名，没有则返回None"""
+        try:
+            with open(File, 'r', encoding='utf-8', errors='replace') as F:
+                Head = F.read(8192)
+        except OSError:
+            return None
+        Match = re.match(r'(?:\s+|//[^\n]*\n|/\*.*?\*/)*#\s*include\s*<([\w/+.\-]+)>', Head, re.DOTALL)
+        return Match.group(1) if Match else None
+
+    def EnsurePch(self, File, Flags):
+        """为源文件的首个系统头文件准备预编译头，返回应加入 -I 的目录，无法使用时返回None
+        
+        每个 (编译器, 标准, 优化等级, 宏) 组合各有一份 .gch，编译器变化时旧的会被清理"""
+        Header = self.FirstSystemHeader(File)
+        if Header is None:
+            return None
+        Version = self.CompilerVersion()
+        Key = hashlib.sha256("\0".join([Version, *Flags, Header]).encode()).hexdigest()[:32]
+        PchRoot = self.GetCacheDir("pch")
+        PchDir = os.path.join(PchRoot, Key)
+        Gch = os.path.join(PchDir, Header + ".gch")
+        if os.path.exists(Gch):
+            return PchDir
+
+        os.makedirs(os.path.dirname(Gch), exist_ok=True)
+        with open(os.path.join(PchRoot, ".lock"), "w") as Lock:
+            # 加锁避免多个实例同时生成同一份预编译头
+            fcntl.flock(Lock, fcntl.LOCK_EX)
+            if os.path.exists(Gch):
+                return PchDir
+            print(f"🧱 正在生成预编译头 <{Header}> ({' '.join(Flags)})", file=sys.stderr)
+            Stub = os.path.join(PchDir, "stub.h")
+            with open(Stub, "w", encoding="utf-8") as F:
+                F.write(f"#include <{Header}>\n")
+            Tmp = Gch + ".tmp"
+            Result = subprocess.run(['g++', '-x', 'c++-header', *Flags, Stub, '-o', Tmp],
+                                    capture_output=True, text=True)
+            if Result.returncode != 0:
+                print("⚠️ 预编译头生成失败，使用普通编译", file=sys.stderr)
+                shutil.rmtree(PchDir, ignore_errors=True)
+                return None
+            os.replace(Tmp, Gch)
+            with open(os.path.join(PchDir, "compiler"), "w", encoding="utf-8") as F:
+                F.write(Version)
+
+            # 清理由旧版本编译器生成的预编译头
+            with os.scandir(PchRoot) as It:
+                for Entry in It:
+                    if not Entry.is_dir() or Entry.name == Key:
+                        continue
+                    try:
+                        with open(os.path.join(Entry.path, "compiler"), encoding="utf-8") as F:
+                            Stale = F.read() != Version
+                    except FileNotFoundError:
+                        Stale = True
+                    if Stale:
+                        shutil.rmtree(Entry.path, ignore_errors=True)
+        return PchDir
+
+    def EvictCompileCache(self, MaxBytes):
+        """按最近使用时间淘汰编译缓存，使总大小不超过 MaxBytes"""
+        CacheDir = self.GetCacheDir("bin")
+        Entries = []
+        Total = 0
+        with os.scandir(CacheDir) as It:
+            for Entry in It:
+                if not Entry.name.endswith(".app"):
+                    continue
+                try:
+                    Stat = Entry.stat()
+                except FileNotFoundError:
+                    continue
+                Entries.append((Stat.st_mtime, Stat.st_size, Entry.path))
+                Total += Stat.st_size
+        if Total <= MaxBytes:
+            return
+        Entries.sort()
+        for MTime, Size, Path in Entries:
+            if Total <= MaxBytes:
+                break
+            try:
+                os.remove(Path)
+                Total -= Size
+                self.UpdateCacheStats(Evicted=True)
+            except FileNotFoundError:
+                pass
+
+    def UpdateCacheStats(self, Hit=False, Evicted=False):
+        """更新编译缓存的命中/未命中/淘汰计数（文件锁保护，多实例安全）"""
+        StatsPath = os.path.join(self.GetCacheDir("bin"), "stats.json")
+        with open(StatsPath, "a+", encoding="utf-8") as F:
+            fcntl.flock(F, fcntl.LOCK_EX)
+            F.seek(0)
+            try:
+                Stats = json.loads(F.read() or "{}")
+            except ValueError:
+                Stats = {}
+            if Evicted:
+                Stats["淘汰"] = Stats.get("淘汰", 0) + 1
+            elif Hit:
+                Stats["命中"] = Stats.get("命中", 0) + 1
+            else:
+                Stats["未命中"] = Stats.get("未命中", 0) + 1
+            F.seek(0)
+            F.truncate()
+            F.write(json.dumps(Stats, ensure_ascii=False))
+
+    def CacheInfo(self, Clear=False):
+        """显示编译缓存统计，或清空编译缓存"""
+        CacheDir = self.GetCacheDir("bin")
+        if Clear:
+            shutil.rmtree(CacheDir, ignore_errors=True)
+            shutil.rmtree(self.GetCacheDir("pch"), ignore_errors=True)
+            shutil.rmtree(self.GetCacheDir("results"), ignore_errors=True)
+            print(f"🧹 已清空编译缓存、预编译头与结果缓存: {os.path.dirname(CacheDir)}")
+            return
+        try:
+            with open(os.path.join(CacheDir, "stats.json"), encoding="utf-8") as F:
+                Stats = json.loads(F.read() or "{}")
+        except (FileNotFoundError, ValueError):
+            Stats = {}
+        Count = 0
+        Total = 0
+        with os.scandir(CacheDir) as It:
+            for Entry in It:
+                if Entry.name.endswith(".app"):
+                    Count += 1
+                    Total += Entry.stat().st_size
+        Hits = Stats.get("命中", 0)
+        Misses = Stats.get("未命中", 0)
+        Rate = Hits / (Hits + Misses) * 100 if Hits + Misses else 0
+        print(f"📦 编译缓存: {CacheDir}")
+        print(f"   条目: {Count}    大小: {Total/1024/1024:.1f}MB")
+        print(f"   命中: {Hits}    未命中: {Misses}    淘汰: {Stats.get('淘汰', 0)}    命中率: {Rate:.1f}%")
+        PchCount = sum(1 for Entry in os.scandir(self.GetCacheDir("pch")) if Entry.is_dir())
+        print(f"   预编译头: {PchCount} 组")
+        Db = self.OpenResultCache()
+        try:
+            self.PruneResultCache(Db, Force=True)
+            Results = Db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        finally:
+            Db.close()
+        print(f"   结果缓存: {Results} 条通过记录")
+
+    def CalibrationHost(self):
+        """本机标识（CPU型号 + 架构 + 编译器版本），任何一项变化后需要重新校准"""
+        Model = ""
+        try:
+            with open("/proc/cpuinfo", encoding="utf-8", errors="replace") as F:
+                for Line in F:
+                    if Line.startswith("model name"):
+                        Model = Line.partition(":")[2].strip()
+                        break
+        except OSError:
+            pass
+        Text = "\n".join((Model, os.uname().machine, self.CompilerVersion()))
+        return hashlib.sha256(Text.encode()).hexdigest()[:16]
+
+    def ReferenceTimes(self):
+        """参考机器上各项基准的耗时：优先使用 Calibrate --save-reference 保存的记录，否则使用内置值"""
+        try:
+            with open(os.path.join(self.GetCacheDir("calibration"), "reference.json"), encoding="utf-8") as F:
+                Saved = json.load(F)["耗时"]
+        except (OSError, ValueError, KeyError):
+            Saved = {}
+        return {Name: Saved.get(Name, Default) for Name, Default in CalibrationBenchmarks}
+
+    def MeasureBenchmarks(self, Repeat=3):
+        """编译并运行校准基准，返回 {名称: 最短CPU时间ms}，失败时返回None"""
+        Key = hashlib.sha256((self.CompilerVersion() + CalibrationSource).encode()).hexdigest()[:16]
+        Program = os.path.join(self.GetCacheDir("calibration"), f"bench-{Key}")
+        if not os.path.exists(Program):
+            Tmp = f"{Program}.{os.getpid()}.tmp"
+            Result = subprocess.run(['g++', '-x', 'c++', '-std=c++17', '-O2', '-o', Tmp, '-'],
+                                    input=CalibrationSource, capture_output=True, text=True)
+            if Result.returncode != 0:
+                print(f"❌ 校准基准编译失败:\n{Result.stderr.strip()}", file=sys.stderr)
+                return None
+            os.replace(Tmp, Program)
+
+        # 串行运行并绑定到当前可用的第一个CPU，取最短时间以排除偶发干扰
+        Config = {"时间限制": 60000, "内存限制": 1024}
+        Cpu = min(os.sched_getaffinity(0))
+        WorkDir = self.CreateWorkDir()
+        Times = {}
+        try:
+            for Index, (Name, _) in enumerate(CalibrationBenchmarks):
+                Best = None
+                for _ in range(Repeat):
+                    Run = self.Execute([Program, str(Index)], WorkDir, Config, Cpu=Cpu)
+                    if Run['Error'] or Run['ReturnCode'] != 0 or Run['TimeExceeded']:
+                        print(f"❌ 校准基准 {Name} 运行失败: {Run['Error'] or Run.get('Stderr', '').strip()}",
+                              file=sys.stderr)
+                        return None
+                    Best = Run['CpuTime'] if Best is None else min(Best, Run['CpuTime'])
+                Times[Name] = round(Best, 1)
+        finally:
+            self.CleanupTestFiles(WorkDir)
+        return Times
+
+    def SpeedFactor(self):
+        """本机相对参考机器的速度系数（本机耗时 / 参考耗时 的几何平均，大于1表示本机更慢）
+        
+        测量结果按本机标识缓存在 calibration/speed.json，首次使用或换机后自动校准"""
+        if getattr(self, "_SpeedFactor", None) is None:
+            Host = self.CalibrationHost()
+            try:
+                with open(os.path.join(self.GetCacheDir("calibration"), "speed.json"), encoding="utf-8") as F:
+                    Saved = json.load(F)
+                Times = Saved["耗时"] if Saved.get("主机") == Host else None
+            except (OSError, ValueError, KeyError):
+                Times = None
+            if Times is None:
+                print("⏳ 尚未校准本机速度，正在运行校准基准...", file=sys.stderr)
+                Times = self.Calibrate(Quiet=True)
+            Reference = self.ReferenceTimes()
+            Ratios = [Times[Name] / Reference[Name] for Name, _ in CalibrationBenchmarks
+                      if Times and Times.get(Name) and Reference[Name] > 0]
+            self._SpeedFactor = math.exp(sum(map(math.log, Ratios)) / len(Ratios)) if Ratios else 1.0
+        return self._SpeedFactor
+
+    def Calibrate(self, Quiet=False, SaveReference=False):
+        """重新运行校准基准并缓存结果；SaveReference 为真时把本机记为参考机器，返回各项耗时"""
+        Times = self.MeasureBenchmarks()
+        if Times is None:
+            return None
+        Dir = self.GetCacheDir("calibration")
+        Record = {"主机": self.CalibrationHost(), "耗时": Times,
+                  "时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        for Name in ("speed.json", "reference.json") if SaveReference else ("speed.json",):
+            Tmp = os.path.join(Dir, f"{Name}.{os.getpid()}.tmp")
+            with open(Tmp, "w", encoding="utf-8") as F:
+                json.dump(Record, F, ensure_ascii=False, indent=1)
+            os.replace(Tmp, os.path.join(Dir, Name))
+        self._SpeedFactor = None
+        Factor = self.SpeedFactor()
+        if Quiet:
+            print(f"⚖️ 本机速度系数: {Factor:.2f}", file=sys.stderr)
+            return Times
+
+        Reference = self.ReferenceTimes()
+        print(f"⚖️ 时间校准结果（缓存于 {Dir}）")
+        print(f"   {'基准':<10}{'本机(ms)':>10}{'参考(ms)':>10}{'比值':>8}")
+        for Name, _ in CalibrationBenchmarks:
+            print(f"   {Name:<10}{Times[Name]:>10.1f}{Reference[Name]:>10.1f}{Times[Name] / Reference[Name]:>8.2f}")
+        if SaveReference:
+            print("📌 已将本机记为参考机器，此后的速度系数都相对本机计算")
+        if abs(Factor - 1) < 0.02:
+            Relation = "与参考机器相当"
+        else:
+            Relation = f"{'慢于' if Factor > 1 else '快于'}参考机器 {abs(Factor - 1) * 100:.0f}%"
+        print(f"⚖️ 本机速度系数: {Factor:.2f}（{Relation}）")
+        print(f"   开启配置 \"时间校准\": 1 后，实际时间限制调整为 原限制 × {Factor:.2f}，输出的时间换算为参考机器上的时间")
+        return Times
+
+    def OpenHistory(self):
+        """打开运行历史数据库（缓存目录下的 history/history.db，清空缓存时保留）"""
+        Db = sqlite3.connect(os.path.join(self.GetCacheDir("history"), "history.db"), timeout=30)
+        Db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, file TEXT, revision TEXT, time REAL,
+                                             binary TEXT, passed INTEGER, total INTEGER, phases TEXT);
+            CREATE TABLE IF NOT EXISTS samples (run INTEGER, num TEXT, input TEXT, verdict TEXT,
+                                                cputime REAL, walltime REAL, memory INTEGER, phases TEXT);
+            CREATE INDEX IF NOT EXISTS runs_file ON runs (file, time);
+            CREATE INDEX IF NOT EXISTS samples_run ON samples (run);
+        """)
+        return Db
+
+    def SourceRevision(self, File):
+        """源码版本：去掉最后一个注释块（配置与样例）后的源码哈希，只改样例不产生新版本"""
+        with open(File, 'rb') as F:
+            Content = F.read()
+        Block = self.FindConfigBlock(Content)
+        Code = Content[:Block[0]] + Content[Block[1]:] if Block else Content
+        return hashlib.sha256(Code).hexdigest()
+
+    def InputKey(self, Sample):
+        """样例输入的标识：注释中的样例取内容哈希，外部数据取 路径:大小:修改时间（不读取文件内容）"""
+        if 'InputPath' in Sample:
+            try:
+                Info = os.stat(Sample['InputPath'])
+            except OSError:
+                return None
+            return f"{os.path.abspath(Sample['InputPath'])}:{Info.st_size}:{Info.st_mtime_ns}"
+        return hashlib.sha256(Sample['Input'].encode()).hexdigest()
+
+    def RecordHistory(self, File, ResFile, Phases, Runs, Config, Cached=()):
+        """把一次测试的阶段耗时与逐样例的判定、时间、内存追加到运行历史
+        
+        Cached 为命中结果缓存的样例，按通过记录，时间与内存取缓存中的值（没有墙钟时间与阶段耗时）"""
+        Db = self.OpenHistory()
+        try:
+            Passed = sum(self.MakeResult(Run, Config).Passed for Run in Runs) + len(Cached)
+            Cursor = Db.execute("INSERT INTO runs (file, revision, time, binary, passed, total, phases) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                (os.path.abspath(File), self.SourceRevision(File), time.time(),
+                                 os.path.basename(ResFile), Passed, len(Runs) + len(Cached), json.dumps(Phases)))
+            Db.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+                (Cursor.lastrowid, str(Run['Num']), Run.get('InputKey'),
+                 'ERR' if Run['Error'] else self.Classify(Run, Config),
+                 Run.get('CpuTime'), Run.get('WallTime'), Run.get('MaxMemory'), json.dumps(Run['Phases']))
+                for Run in Runs] + [
+                (Cursor.lastrowid, str(Entry['Num']), Entry['InputKey'], 'AC',
+                 Entry['CpuTime'], None, Entry['MaxMemory'], "{}")
+                for Entry in Cached])
+            Db.commit()
+        finally:
+            Db.close()
+
+    def ShowPhases(self, Phases, Samples=None):
+        """输出各阶段耗时；Samples 为逐样例阶段耗时之和（并行时可能超过总用时）"""
+        print("⏲️ 阶段耗时: " + "  ".join(f"{Name} {Value * 1000:.1f}ms" for Name, Value in Phases.items()))
+        if Samples:
+            print("   样例累计: " + "  ".join(f"{Name} {Value * 1000:.1f}ms" for Name, Value in Samples.items()))
+
+    def Report(self, File, Count=10, Threshold=10.0, MinDelta=2.0):
+        """比较同一份代码最近 Count 个版本的运行历史，标出相邻版本间变慢（或内存增加）超过 Threshold% 的样例
+        
+        每个版本中同一样例取多次运行的CPU时间中位数，只比较输入未变化的样例；变化小于 MinDelta 毫秒视为噪声"""
+        Path = os.path.abspath(File)
+        Db = self.OpenHistory()
+        try:
+            Rows = Db.execute("SELECT id, revision, time, passed, total, phases FROM runs WHERE file=? ORDER BY time",
+                              (Path,)).fetchall()
+            if not Rows:
+                print(f"📭 没有运行历史: {File}（运行 Test 后自动记录）")
+                return []
+            # 按版本首次出现的顺序分组，只保留最近 Count 个版本
+            Revisions = {}
+            for Id, Revision, When, Passed, Total, Phases in Rows:
+                Revisions.setdefault(Revision, []).append((Id, When, Passed, Total, Phases))
+            Order = list(Revisions)[-Count:]
+            Stats = {}
+            for Revision in Order:
+                Ids = [Item[0] for Item in Revisions[Revision]]
+                Samples = {}
+                for Num, Input, Verdict, Cpu, Memory in Db.execute(
+                        f"SELECT num, input, verdict, cputime, memory FROM samples WHERE run IN "
+                        f"({','.join('?' * len(Ids))})", Ids):
+                    if Cpu is not None:
+                        Entry = Samples.setdefault(Num, {"input": Input, "cpu": [], "memory": [], "verdicts": set()})
+                        Entry["cpu"].append(Cpu)
+                        Entry["memory"].append(Memory)
+                        Entry["verdicts"].add(Verdict)
+                Stats[Revision] = {Num: {"input": Entry["input"], "cpu": statistics.median(Entry["cpu"]),
+                                         "memory": max(Entry["memory"]), "verdicts": Entry["verdicts"]}
+                                   for Num, Entry in Samples.items()}
+        finally:
+            Db.close()
+
+        print(f"📊 运行历史: {File}（{len(Revisions)} 个版本，{len(Rows)} 次运行，显示最近 {len(Order)} 个版本）")
+        print(f"   {'版本':<10}{'最近运行':<21}{'运行':>4}{'通过':>8}{'CPU合计':>10}{'最慢':>9}{'峰值内存':>10}")
+        for Revision in Order:
+            Runs = Revisions[Revision]
+            Samples = Stats[Revision]
+            Last = Runs[-1]
+            Total = sum(Entry["cpu"] for Entry in Samples.values())
+            Slowest = max((Entry["cpu"] for Entry in Samples.values()), default=0)
+            Memory = max((Entry["memory"] or 0 for Entry in Samples.values()), default=0)
+            print(f"   {Revision[:8]:<10}{datetime.fromtimestamp(Last[1]).strftime('%Y-%m-%d %H:%M:%S'):<21}"
+                  f"{len(Runs):>4}{f'{Last[2]}/{Last[3]}':>8}{Total:>8.1f}ms{Slowest:>7.1f}ms"
+                  f"{Memory / 1024 / 1024:>8.1f}MB")
+        Phases = json.loads(Revisions[Order[-1]][-1][4] or "{}")
+        if Phases:
+            self.ShowPhases(Phases)
+
+        Regressions = []
+        for Old, New in zip(Order, Order[1:]):
+            for Num, Entry in Stats[New].items():
+                Before = Stats[Old].get(Num)
+                if Before is None or Before["input"] != Entry["input"]:
+                    continue
+                Delta = Entry["cpu"] - Before["cpu"]
+                if Delta > MinDelta and Delta > Before["cpu"] * Threshold / 100:
+                    Regressions.append((Old, New, Num, "时间", Before["cpu"], Entry["cpu"]))
+                Growth = (Entry["memory"] or 0) - (Before["memory"] or 0)
+                if Growth > 1024 * 1024 and Growth > (Before["memory"] or 0) * Threshold / 100:
+                    Regressions.append((Old, New, Num, "内存", Before["memory"], Entry["memory"]))
+                if "AC" in Before["verdicts"] and "AC" not in Entry["verdicts"]:
+                    Regressions.append((Old, New, Num, "判定", "AC", "/".join(sorted(Entry["verdicts"]))))
+        if not Regressions:
+            print(f"✅ 相邻版本之间没有超过 {Threshold:g}% 的性能回归")
+            return Regressions
+        print(f"📉 发现 {len(Regressions)} 处回归（阈值 {Threshold:g}%，噪声下限 {MinDelta:g}ms）:")
+        for Old, New, Num, Kind, Before, After in Regressions:
+            if Kind == "时间":
+                Detail = f"⏱️ {Before:.1f}ms → {After:.1f}ms (+{(After / Before - 1) * 100 if Before else 100:.0f}%)"
+            elif Kind == "内存":
+                Detail = f"💾 {Before / 1024 / 1024:.1f}MB → {After / 1024 / 1024:.1f}MB"
+            else:
+                Detail = f"{Before} → {After}"
+            print(f"   {Old[:8]} → {New[:8]}  样例 {Num}: {Detail}")
+        return Regressions
+
+    def PrepareInteractor(self, File, Config, Interactor=None):
+        """交互题：编译交互器（命令行参数优先，其次为配置中相对源文件的"交互器"），
+        成功时把程序路径记入 Config["交互器程序"]，返回错误信息，不是交互题或编译成功时返回None"""
+        if Interactor is None and Config.get("交互器"):
+            Interactor = os.path.join(os.path.dirname(os.path.abspath(File)), Config["交互器"])
+        if Interactor is None:
+            return None
+        if not os.path.exists(Interactor):
+            return f"交互器不存在: {Interactor}"
+        # 交互器直接使用标准输入输出，不定义 DEBUG
+        Binary, _, Output = self.Compile(Interactor, Config, Debug=False)
+        if Binary is None:
+            return "交互器编译失败" + (f":\n{Output}" if Output else "")
+        Config["交互器程序"] = Binary
+        return None
+
+    def WithDefaults(self, Config, Overrides=None):
+        """补全配置中缺少的项（DefaultConfig），Overrides 中的键优先，返回新的字典"""
+        return {**DefaultConfig, **(Config or {}), **(Overrides or {})}
+
+    def LoadConfig(self, File, Fallback):
+        """读取源文件中的配置，没有配置时使用 Fallback"""
+        Config, _ = self.Getonfig(File, Quiet=True)
+        return dict(Fallback, **(Config or {}))
+
+    def LooseConfig(self, Config):
+        """辅助程序（暴力程序、生成器）没有自己的配置时使用的宽松限制：时间×10（至少10s），内存至少1GB"""
+        return dict(Config, **{"时间限制": max(Config["时间限制"] * 10, 10000),
+                               "内存限制": max(Config["内存限制"], 1024)})
+
+    def MissingFile(self, *Paths):
+        """检查文件是否都存在（None 表示未提供，跳过），有缺失时输出第一个并返回真"""
+        for Path in Paths:
+            if Path is not None and not os.path.exists(Path):
+                print(f"❌ 文件不存在: {Path}")
+                return True
+        return False
+
+    def CompileAll(self, Roles):
+        """依次编译多个程序，Roles 为 (角色, 路径, 配置, 是否定义DEBUG) 的序列
+        
+        返回 {角色: (程序绝对路径, 配置)}；编译失败时输出编译器信息并返回None"""
+        Programs = {}
+        for Role, Path, Config, Debug in Roles:
+            print(f"🔧 编译{Role}: {Path}")
+            ResFile, Hit, Output = self.Compile(Path, Config, Debug=Debug)
+            if ResFile is None:
+                print(f"❌ {Role}编译失败:")
+                if Output:
+                    print(Output)
+                return None
+            Programs[Role] = (os.path.abspath(ResFile), Config)
+        return Programs
+
+    def DeltaDebug(self, Units, Fails, Pool):
+        """ddmin：在 Units 中寻找仍然失败的最小子序列，每一轮的候选在线程池中并行测试，按顺序取第一个失败的"""
+        Granularity = 2
+        while len(Units) >= 2:
+            Size = -(-len(Units) // Granularity)
+            Subsets = [Units[I:I + Size] for I in range(0, len(Units), Size)]
+            Candidates = list(Subsets)
+            if len(Subsets) > 2:
+                Candidates += [Units[:I] + Units[I + Size:] for I in range(0, len(Units), Size)]
+            Futures = [Pool.submit(Fails, Candidate) for Candidate in Candidates]
+            Found = None
+            for Index, Future in enumerate(Futures):
+                if Future.result():
+                    Found = Index
+                    break
+            for Future in Futures:
+                Future.cancel()
+            if Found is not None:
+                Units = Candidates[Found]
+                # 缩小到某个子集时重新从粗粒度开始，缩小到补集时粒度减一
+                Granularity = 2 if Found < len(Subsets) else max(Granularity - 1, 2)
+                continue
+            if Granularity >= len(Units):
+                break
+            Granularity = min(len(Units), Granularity * 2)
+        return Units
+
+    def Minimize(self, File, InputPath, BruteFile=None, AnswerPath=None, Workers=None, OutputPath=None):
+        """自动缩小失败的输入：先按行、再按词做 delta debugging，保持判定类别（WA / 同一信号的RE / TLE / MLE）不变
+        
+        候选输入在全部CPU上并行运行；按内容哈希记忆判定结果，同一候选不会运行两次。
+        答案错误的输入需要暴力程序为每个候选生成答案"""
+        if self.MissingFile(File, InputPath, BruteFile, AnswerPath):
+            return None
+        Config = self.LoadConfig(File, DefaultConfig)
+        Roles = [("待测程序", File, Config, True)]
+        if BruteFile is not None:
+            Roles.append(("暴力程序", BruteFile, self.LoadConfig(BruteFile, self.LooseConfig(Config)), True))
+        Programs = self.CompileAll(Roles)
+        if Programs is None:
+            return None
+        Sol, _ = Programs["待测程序"]
+
+        if Workers is None or Workers <= 0:
+            Workers = len(os.sched_getaffinity(0))
+        Slots = self.MakeSlots(Workers)
+        Memo = {}
+        MemoLock = threading.Lock()
+        Stats = {"运行": 0, "命中": 0}
+
+        def Judge(Data, Answer=None):
+            """返回输入的判定类别，RE 附带退出码/信号；暴力程序失败的候选视为无效（None）"""
+            Key = hashlib.sha256(Data).hexdigest()
+            with MemoLock:
+                if Key in Memo:
+                    Stats["命中"] += 1
+                    return Memo[Key]
+            Cpu = Slots.get()
+            WorkDir = self.CreateWorkDir()
+            try:
+                InPath = os.path.join(WorkDir, "test.in")
+                OutPath = os.path.join(WorkDir, "test.out")
+                AnsPath = Answer or os.devnull
+                with open(InPath, "wb") as F:
+                    F.write(Data)
+                Verdict = None
+                if "暴力程序" in Programs:
+                    Brute, BruteConfig = Programs["暴力程序"]
+                    AnsPath = os.path.join(WorkDir, "test.ans")
+                    Result = self.Execute([Brute], WorkDir, BruteConfig, Cpu, Stdin=InPath, Stdout=OutPath)
+                    if Result['Error'] or Result['ReturnCode'] != 0 or Result['TimeExceeded']:
+                        AnsPath = None
+                    else:
+                        os.replace(OutPath, AnsPath)
+                if AnsPath is not None:
+                    Run = self.Execute([Sol], WorkDir, Config, Cpu, Stdin=InPath, Stdout=OutPath)
+                    if not Run['Error']:
+                        Run['Mismatch'] = None
+                        if not Run['TimeExceeded'] and not Run['MemExceeded'] and Run['ReturnCode'] == 0:
+                            Run['Mismatch'] = self.Check(OutPath, AnsPath, Config)
+                        Verdict = self.Classify(Run, Config)
+                        if Verdict == 'RE':
+                            Verdict = f"RE({Run['ReturnCode']})"
+            finally:
+                self.CleanupTestFiles(WorkDir)
+                Slots.put(Cpu)
+            with MemoLock:
+                Memo[Key] = Verdict
+                Stats["运行"] += 1
+            return Verdict
+
+        with open(InputPath, "rb") as F:
+            Original = F.read()
+        Target = Judge(Original, AnswerPath)
+        if Target is None:
+            print("❌ 无法判定原始输入（程序启动失败或暴力程序运行失败）")
+            return None
+        if Target == 'AC':
+            print("✅ 原始输入可以通过，无需缩小")
+            return None
+        if Target == 'WA' and "暴力程序" not in Programs:
+            print("❌ 答案错误的输入需要使用 --brute 指定暴力程序，才能为缩小后的输入生成答案")
+            return None
+        OriginalLines = Original.count(b"\n")
+        print(f"🎯 目标判定: {Target}（{len(Original)} 字节，{OriginalLines} 行），{Workers} 路并行\n")
+
+        Current = Original
+        with ThreadPoolExecutor(max_workers=Workers) as Pool:
+            # 行级：以行为单位（保留换行符）
+            Lines = Current.splitlines(keepends=True)
+            Lines = self.DeltaDebug(Lines, lambda Units: Judge(b"".join(Units)) == Target, Pool)
+            Current = b"".join(Lines)
+            print(f"🔽 行级缩小: {OriginalLines} → {len(Lines)} 行，{len(Current)} 字节")
+            # 词级：每个词连同其后的空白为一个单位，开头的空白保持不变
+            Prefix = re.match(rb"\s*", Current).group(0)
+            Tokens = re.findall(rb"\S+\s*", Current[len(Prefix):])
+            Tokens = self.DeltaDebug(Tokens, lambda Units: Judge(Prefix + b"".join(Units)) == Target, Pool)
+            Current = Prefix + b"".join(Tokens)
+            print(f"🔽 词级缩小: → {len(Tokens)} 个词，{len(Current)} 字节")
+
+        OutputPath = OutputPath or os.path.splitext(InputPath)[0] + ".min.in"
+        with open(OutputPath, "wb") as F:
+            F.write(Current)
+        print(f"\n✅ 最小输入（判定仍为 {Target}）已保存到: {OutputPath}")
+        print(f"   共运行 {Stats['运行']} 个候选，记忆命中 {Stats['命中']} 次")
+        if len(Current) <= 1024:
+            print("—— 最小输入 ——")
+            print(Current.decode("utf-8", errors="replace").rstrip("\n"))
+        return Current
+
+    def Stress(self, File, BruteFile, GenFile, Iterations=1000, Workers=None, Seed=1):
+        """对拍：生成器(种子) → 暴力程序 → 待测程序 → 比较，遇到第一个反例即停止并保存
+        
+        三个程序只编译一次；每轮在独立目录中运行，复用 AutoTest 的资源限制与 Check 比较"""
+        if self.MissingFile(File, BruteFile, GenFile):
+            return False
+        Config = self.LoadConfig(File, DefaultConfig)
+        # 暴力程序与生成器没有自己的配置时放宽限制
+        Loose = self.LooseConfig(Config)
+        Programs = self.CompileAll([("待测程序", File, Config, True),
+                                    ("暴力程序", BruteFile, self.LoadConfig(BruteFile, Loose), True),
+                                    ("生成器", GenFile, self.LoadConfig(GenFile, Loose), False)])
+        if Programs is None:
+            return False
+
+        Workers = self.ResolveWorkers(Workers, Config)
+        Slots = self.MakeSlots(Workers)
+        Stop = threading.Event()
+
+        def Iterate(CurrentSeed):
+            """运行一轮对拍，返回 (种子, 结论, 说明, 工作目录)"""
+            if Stop.is_set():
+                return CurrentSeed, None, None, None
+            Cpu = Slots.get()
+            WorkDir = self.CreateWorkDir()
+            InPath = os.path.join(WorkDir, "test.in")
+            OutPath = os.path.join(WorkDir, "test.out")
+            AnsPath = os.path.join(WorkDir, "test.ans")
+            try:
+                Gen, GenConfig = Programs["生成器"]
+                Result = self.Execute([Gen, str(CurrentSeed)], WorkDir, GenConfig, Cpu, Stdout=InPath)
+                if Result['Error'] or Result['ReturnCode'] != 0 or Result['TimeExceeded']:
+                    return CurrentSeed, "ERROR", f"生成器运行失败 {Result['Error'] or Result.get('ReturnCode')}", WorkDir
+                Brute, BruteConfig = Programs["暴力程序"]
+                Result = self.Execute([Brute], WorkDir, BruteConfig, Cpu, Stdin=InPath, Stdout=OutPath)
+                if Result['Error'] or Result['ReturnCode'] != 0 or Result['TimeExceeded']:
+                    return CurrentSeed, "ERROR", f"暴力程序运行失败 {Result['Error'] or Result.get('ReturnCode')}", WorkDir
+                os.replace(OutPath, AnsPath)
+                Sol, SolConfig = Programs["待测程序"]
+                Run = self.Execute([Sol], WorkDir, SolConfig, Cpu, Stdin=InPath, Stdout=OutPath)
+                if Run['Error']:
+                    return CurrentSeed, "ERROR", f"待测程序启动失败 {Run['Error']}", WorkDir
+                Run['Mismatch'] = None
+                if not Run['TimeExceeded'] and not Run['MemExceeded'] and Run['ReturnCode'] == 0:
+                    Run['Mismatch'] = self.Check(OutPath, AnsPath, SolConfig)
+                Verdict = self.Classify(Run, SolConfig)
+                Detail = ""
+                if Verdict == 'WA':
+                    Detail = f"第 {Run['Mismatch'][0]} 行第 {Run['Mismatch'][1]} 列"
+                elif Verdict == 'RE':
+                    Detail = f"退出码 {Run['ReturnCode']}"
+                elif Verdict == 'TLE':
+                    Detail = f"{Run['CpuTime']:.0f}ms"
+                return CurrentSeed, Verdict, Detail, WorkDir
+            finally:
+                Slots.put(Cpu)
+
+        print(f"🔄 开始对拍（{Workers} 路并行，最多 {Iterations} 轮，起始种子 {Seed}）")
+        StartTime = time.perf_counter()
+        Failure = None
+        Done = 0
+        with ThreadPoolExecutor(max_workers=Workers) as Pool:
+            Pending = deque()
+            NextSeed = Seed
+            while Pending or (NextSeed < Seed + Iterations and not Stop.is_set()):
+                while NextSeed < Seed + Iterations and not Stop.is_set() and len(Pending) < Workers * 2:
+                    Pending.append(Pool.submit(Iterate, NextSeed))
+                    NextSeed += 1
+                CurrentSeed, Verdict, Detail, WorkDir = Pending.popleft().result()
+                if Verdict is None:
+                    continue
+                Done += 1
+                if Verdict != 'AC' and (Failure is None or CurrentSeed < Failure[0]):
+                    # 取种子最小的反例，保证结果可复现；其余工作目录直接清理
+                    if Failure is not None:
+                        self.CleanupTestFiles(Failure[3])
+                    Failure = (CurrentSeed, Verdict, Detail, WorkDir)
+                    Stop.set()
+                else:
+                    self.CleanupTestFiles(WorkDir)
+                if Done % 100 == 0 and not Stop.is_set():
+                    Speed = Done / (time.perf_counter() - StartTime)
+                    print(f"\r   已完成 {Done} 轮 ({Speed:.0f} 轮/秒)", end="", flush=True)
+
+        Elapsed = time.perf_counter() - StartTime
+        if Done >= 100:
+            print()
+        if Failure is None:
+            print(f"✅ 对拍完成：{Done} 轮全部一致，用时 {Elapsed:.1f}s ({Done / Elapsed:.0f} 轮/秒)")
+            return True
+
+        CurrentSeed, Verdict, Detail, WorkDir = Failure
+        # 反例保存为可直接用于 Test -d 的数据目录
+        SaveDir = os.path.splitext(File)[0] + ".stress"
+        os.makedirs(SaveDir, exist_ok=True)
+        # 待测程序的输出另存为 .actual，避免被数据目录当作答案文件(.out)
+        for Name, Suffix in (("test.in", ".in"), ("test.ans", ".ans"), ("test.out", ".actual")):
+            Source = os.path.join(WorkDir, Name)
+            if os.path.exists(Source):
+                shutil.copyfile(Source, os.path.join(SaveDir, f"seed{CurrentSeed}{Suffix}"))
+        self.CleanupTestFiles(WorkDir)
+        if Verdict == "ERROR":
+            print(f"❌ 种子 {CurrentSeed} 对拍中断: {Detail}")
+        else:
+            print(f"❌ 种子 {CurrentSeed} 发现反例：{Verdict} {Detail}（共运行 {Done} 轮）")
+        print(f"💾 反例已保存: {SaveDir}/seed{CurrentSeed}.in")
+        print(f"   复现: python3 OITools.py Test {File} -d {SaveDir}")
+        return False
+
+    def FitModel(self, Sizes, Values, Model):
+        """以相对误差加权的最小二乘拟合 Value ≈ A + C·f(n)（A, C ≥ 0），返回 (A, C, 相对均方根误差)"""
+        X = [Model(N) for N in Sizes]
+        W = [1.0 / max(V, 1e-9) ** 2 for V in Values]
+        SW = sum(W)
+        SX = sum(Wi * Xi for Wi, Xi in zip(W, X))
+        SY = sum(Wi * Yi for Wi, Yi in zip(W, Values))
+        SXX = sum(Wi * Xi * Xi for Wi, Xi in zip(W, X))
+        SXY = sum(Wi * Xi * Yi for Wi, Xi, Yi in zip(W, X, Values))
+        Det = SW * SXX - SX * SX
+        if abs(Det) > 1e-12 * max(SW * SXX, 1e-300):
+            C = (SW * SXY - SX * SY) / Det
+            A = (SY - C * SX) / SW
+        else:
+            A, C = SY / SW, 0.0
+        if A < 0:
+            A = 0.0
+            C = SXY / SXX if SXX > 0 else 0.0
+        if C < 0:
+            A, C = SY / SW, 0.0
+        Error = math.sqrt(sum(((A + C * Xi) - Yi) ** 2 * Wi for Wi, Xi, Yi in zip(W, X, Values)) / len(Values))
+        return A, C, Error
+
+    def Complexity(self, File, GenFile, MinSize=1000, MaxSize=1000000, Steps=8, Repeat=3, Target=None, Pin=False):
+        """复杂度估计：用生成器在几何级数规模上生成数据，测量CPU时间与峰值内存，
+        拟合候选复杂度曲线并外推到题目最大规模
+        
+        生成器以 规模 和 种子 作为命令行参数，数据输出到标准输出"""
+        if self.MissingFile(File, GenFile):
+            return None
+        Config = self.LoadConfig(File, DefaultConfig)
+        TimeLimitMS = Config["时间限制"]
+        MemoryLimitMB = Config["内存限制"]
+        # 测量时放宽时间限制，超过时限的规模同样有拟合价值
+        RunConfig = dict(Config, **{"时间限制": TimeLimitMS * 5})
+        GenConfig = self.LoadConfig(GenFile, self.LooseConfig(Config))
+        Programs = self.CompileAll([("待测程序", File, Config, True), ("生成器", GenFile, GenConfig, False)])
+        if Programs is None:
+            return None
+        (Sol, _), (Gen, _) = Programs["待测程序"], Programs["生成器"]
+        Target = Target or Config.get("最大规模")
+        Cpu = sorted(os.sched_getaffinity(0))[-1] if Pin else None
+
+        Ratio = (MaxSize / MinSize) ** (1 / max(Steps - 1, 1))
+        Sizes = sorted({max(1, round(MinSize * Ratio ** I)) for I in range(Steps)})
+        print(f"🔄 开始复杂度测量（{len(Sizes)} 个规模，每个规模测量 {Repeat} 次）\n")
+        print(f"   {'规模 n':>12}  {'CPU中位数':>10}  {'峰值内存':>10}")
+        Measured = []
+        for N in Sizes:
+            WorkDir = self.CreateWorkDir()
+            try:
+                InPath = os.path.join(WorkDir, "test.in")
+                Result = self.Execute([Gen, str(N), "1"], WorkDir, GenConfig, Cpu, Stdout=InPath)
+                if Result['Error'] or Result['ReturnCode'] != 0 or Result['TimeExceeded']:
+                    print(f"❌ 生成器在规模 {N} 运行失败")
+                    break
+                Runs = [self.Execute([Sol], WorkDir, RunConfig, Cpu, Stdin=InPath) for _ in range(Repeat)]
+            finally:
+                self.CleanupTestFiles(WorkDir)
+            if any(R['Error'] or (R['ReturnCode'] != 0 and not R['TimeExceeded']) for R in Runs):
+                print(f"❌ 规模 {N} 运行错误，停止测量")
+                break
+            CpuTime = statistics.median(R['CpuTime'] for R in Runs)
+            Memory = max(R['MaxMemory'] for R in Runs)
+            # 重复测量的相对波动，作为判断拟合误差是否显著的噪声水平
+            Jitter = ((max(R['CpuTime'] for R in Runs) - min(R['CpuTime'] for R in Runs)) / max(CpuTime, 1e-9),
+                      (Memory - min(R['MaxMemory'] for R in Runs)) / max(Memory, 1))
+            Measured.append((N, CpuTime, Memory, Jitter))
+            print(f"   {N:>12}  {CpuTime:>8.1f}ms  {Memory/1024/1024:>8.1f}MB")
+            if any(R['TimeExceeded'] for R in Runs):
+                print(f"⚠️ 规模 {N} 已超过 {RunConfig['时间限制']}ms，停止增大规模")
+                break
+
+        if len(Measured) < 3:
+            print("❌ 有效测量点不足 3 个，无法拟合")
+            return None
+        Sizes = [N for N, _, _, _ in Measured]
+        Report = {}
+        for Index, (Label, Values, Unit) in enumerate((("时间", [T for _, T, _, _ in Measured], "ms"),
+                                                       ("内存", [M / 1024 / 1024 for _, _, M, _ in Measured], "MB"))):
+            # 候选按复杂度从低到高排列
+            Candidates = [(self.FitModel(Sizes, Values, Model), Name, Model) for Name, Model in ComplexityModels]
+            Fits = sorted(Candidates, key=lambda Item: Item[0][2])
+            print(f"\n📐 {Label}拟合（按相对误差排序）:")
+            for (A, C, Error), Name, Model in Fits[:4]:
+                print(f"   {Name:<12} 误差 {Error * 100:6.1f}%")
+            # 简约原则：各规模间的变化在噪声以内时取 O(1)，否则取误差不超过测量噪声（或最优误差）的最简单模型，
+            # 避免高阶模型拟合测量波动后外推出离谱的结果
+            Noise = max(statistics.median(Jitter[Index] for _, _, _, Jitter in Measured), ComplexityNoise[Label])
+            if max(Values) - min(Values) <= max(ComplexityFlat[Label], Noise * max(Values)):
+                (A, C, Error), Name, Model = Candidates[0]
+                print(f"   → 各规模间的变化不超过测量噪声，取 {Name}")
+            else:
+                (A, C, Error), Name, Model = next(Fit for Fit in Candidates if Fit[0][2] <= max(Noise, Fits[0][0][2]))
+                if Name != Fits[0][1]:
+                    print(f"   → 取误差在测量噪声（{Noise * 100:.1f}%）以内的最简模型 {Name}")
+            Report[Label] = {"model": Name, "error": Error}
+            if Target:
+                Predicted = A + C * Model(Target)
+                Report[Label]["predicted"] = Predicted
+                Limit = TimeLimitMS if Label == "时间" else MemoryLimitMB
+                Icon = "✅" if Predicted <= Limit else "⚠️"
+                print(f"🔮 {Icon} 按 {Name} 外推 n={Target}: {Label} ≈ {Predicted:.1f}{Unit} / {Limit}{Unit}")
+        if not Target:
+            print("\n💡 使用 --target 或配置 \"最大规模\" 指定题目最大规模以外推运行时间")
+        return Report
+
+    def DaemonSocket(self, SocketPath=None):
+        """守护进程套接字路径：参数 > $OITOOLS_SOCKET > 缓存目录下的 daemon.sock"""
+        return SocketPath or os.environ.get("OITOOLS_SOCKET") or os.path.join(self.GetCacheDir("daemon"), "daemon.sock")
+
+    def Daemon(self, SocketPath=None):
+        """常驻评测守护进程：在Unix套接字上接收命令，保留已解析的配置、已编译的程序与运行器等热状态
+        
+        请求为一行JSON {"argv", "cwd", "session", "stdin"}；命令逐个执行（需要切换工作目录与标准输出），
+        不同会话（客户端的父进程，如编辑器或终端）之间轮转调度，避免某个脚本的大量请求饿死其他客户端"""
+        SocketPath = self.DaemonSocket(SocketPath)
+        if os.path.exists(SocketPath):
+            Probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                Probe.connect(SocketPath)
+                print(f"⚠️ 守护进程已在运行: {SocketPath}")
+                return
+            except OSError:
+                os.unlink(SocketPath)
+            finally:
+                Probe.close()
+        Server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # 套接字在创建时即只允许本用户访问，避免 bind 与 chmod 之间被其他用户连接
+        Mask = os.umask(0o177)
+        try:
+            Server.bind(SocketPath)
+        finally:
+            os.umask(Mask)
+        Server.listen(64)
+        # 预热运行器与编译器版本，首个请求无需再等待
+        self.GetRunner()
+        self.CompilerVersion()
+        print(f"🚀 守护进程已启动: {SocketPath}（Ctrl+C 退出）")
+
+        Ready = threading.Condition()
+        Queues = {}
+        Sessions = deque()
+
+        def Receive(Conn):
+            try:
+                with Conn.makefile("r", encoding="utf-8") as Reader:
+                    Request = json.loads(Reader.readline())
+            except (OSError, ValueError):
+                Conn.close()
+                return
+            Session = str(Request.get("session", ""))
+            with Ready:
+                if not Queues.get(Session):
+                    Queues[Session] = deque()
+                    Sessions.append(Session)
+                Queues[Session].append((Conn, Request))
+                Ready.notify()
+
+        def Accept():
+            while True:
+                try:
+                    Conn, _ = Server.accept()
+                except OSError:
+                    return
+                threading.Thread(target=Receive, args=(Conn,), daemon=True).start()
+
+        threading.Thread(target=Accept, daemon=True).start()
+        try:
+            while True:
+                with Ready:
+                    Ready.wait_for(lambda: Sessions)
+                    # 轮转：每个会话每次只执行一个请求，还有请求时排到队尾
+                    Session = Sessions.popleft()
+                    Conn, Request = Queues[Session].popleft()
+                    if Queues[Session]:
+                        Sessions.append(Session)
+                    else:
+                        del Queues[Session]
+                Argv = Request.get("argv") or []
+                if Argv == ["Stop"]:
+                    ClientStream(Conn).Send({"out": "👋 守护进程已退出\n", "exit": 0})
+                    Conn.close()
+                    break
+                self.ServeRequest(Conn, Argv, Request)
+        except KeyboardInterrupt:
+            print("\n👋 守护进程已退出")
+        finally:
+            Server.close()
+            try:
+                os.unlink(SocketPath)
+            except OSError:
                 pass
+
+    def ServeRequest(self, Conn, Argv, Request):
+        """在守护进程中执行一条命令，输出转发给客户端，最后发送退出码"""
+        Stream = ClientStream(Conn)
+        Saved = (sys.stdout, sys.stderr, sys.stdin, os.getcwd())
+        Code = 0
+        try:
+            os.chdir(Request.get("cwd") or Saved[3])
+            sys.stdout = sys.stderr = Stream
+            sys.stdin = io.StringIO(Request.get("stdin") or "")
+            if not Argv or Argv[0] in ("Daemon", "Client", "Watch"):
+                print(f"❌ 守护进程不支持该命令: {' '.join(Argv)}")
+                Code = 1
+            else:
+                Dispatch(self, Argv)
+        except SystemExit as E:
+            Code = E.code if isinstance(E.code, int) else (0 if E.code is None else 1)
+        except EOFError:
+            print("❌ 守护进程中无法交互输入，请通过管道提供输入")
+            Code = 1
+        except Exception as E:
+            print(f"❌ 守护进程执行命令失败: {type(E).__name__}: {E}")
+            Code = 1
+        finally:
+            sys.stdout, sys.stderr, sys.stdin = Saved[:3]
+            os.chdir(Saved[3])
+        Stream.Send({"exit": Code})
+        Conn.close()
+
+    def Client(self, Argv, SocketPath=None):
+        """瘦客户端：把命令转发给守护进程并原样输出结果，返回退出码（见 RunClient）"""
+        return RunClient(Argv, self.DaemonSocket(SocketPath))
+
+    def AvailableMemoryMB(self):
+        """系统当前可用内存（/proc/meminfo 的 MemAvailable），读取失败时返回None"""
+        try:
+            with open("/proc/meminfo") as F:
+                for Line in F:
+                    if Line.startswith("MemAvailable:"):
+                        return int(Line.split()[1]) // 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    def Batch(self, Directory, Workers=None, MemoryBudgetMB=None, ReportPath=None):
+        """批量测试目录下的全部源文件：编译与样例运行共用一个有界调度器，
+        编译可以与其他文件的样例运行重叠；所有运行共享全局内存预算，按各自的"内存限制"预留"""
+        Files = []
+        for Root, Dirs, Names in os.walk(Directory):
+            Dirs[:] = [Name for Name in Dirs if not Name.startswith(".") and not Name.endswith(".stress")]
+            Files += [os.path.join(Root, Name) for Name in Names if Name.endswith(".cpp")]
+        # 交互题的交互器不是待测程序，不单独调度
+        Interactors = set()
+        for File in Files:
+            Config, _ = self.Getonfig(File, Quiet=True)
+            if Config and Config.get("交互器"):
+                Interactors.add(os.path.normpath(os.path.join(os.path.dirname(File), Config["交互器"])))
+        Files = [File for File in Files if os.path.normpath(File) not in Interactors]
+        Files.sort(key=lambda Path: self.NaturalKey(os.path.relpath(Path, Directory)))
+        if not Files:
+            print(f"⚠️ 目录中没有 .cpp 源文件: {Directory}")
+            return None
+
+        Cpus = sorted(os.sched_getaffinity(0))
+        Workers = Workers or len(Cpus)
+        if MemoryBudgetMB is None:
+            MemoryBudgetMB = int((self.AvailableMemoryMB() or 4096) * 0.8)
+        # 编译器本身的内存占用按固定值预留
+        CompileMemoryMB = min(512, MemoryBudgetMB)
+        print(f"📦 批量测试 {len(Files)} 个文件（{Workers} 路并行，内存预算 {MemoryBudgetMB}MB）\n")
+        Start = time.perf_counter()
+
+        Budget = threading.Condition()
+        Free = [MemoryBudgetMB]
+
+        def Reserve(Amount):
+            # 超过总预算的任务独占全部预算运行
+            Amount = min(Amount, MemoryBudgetMB)
+            with Budget:
+                Budget.wait_for(lambda: Free[0] >= Amount)
+                Free[0] -= Amount
+            return Amount
+
+        def Release(Amount):
+            with Budget:
+                Free[0] += Amount
+                Budget.notify_all()
+
+        # 调度器：优先级队列，已编译文件的样例优先于尚未开始的编译，尽早给出结果
+        Jobs = queue.PriorityQueue()
+        Order = itertools.count()
+        Outstanding = [0]
+        Lock = threading.Lock()
+
+        def Submit(Priority, Job):
+            with Lock:
+                Outstanding[0] += 1
+            Jobs.put((Priority, next(Order), Job))
+
+        Reports = {File: {"file": os.path.relpath(File, Directory), "status": None, "samples": []} for File in Files}
+
+        def Finish(File, Status):
+            Report = Reports[File]
+            Report["status"] = Status
+            Verdicts = [Sample["verdict"] for Sample in Report["samples"]]
+            Passed = Verdicts.count("AC")
+            with Lock:
+                if Status == "评测完成":
+                    Icon = "✅" if Passed == len(Verdicts) else "❌"
+                    print(f"{Icon} {Report['file']}: {Passed}/{len(Verdicts)} 通过")
+                else:
+                    print(f"⚠️ {Report['file']}: {Status}")
+            self.ReleaseBinary(Report.pop("binary", None))
+
+        def CompileJob(File, Cpu):
+            try:
+                Prepare(File)
+            except Exception as E:
+                Finish(File, f"评测失败（{type(E).__name__}: {E}）")
+
+        def Prepare(File):
+            Config, Samples = self.Getonfig(File, Quiet=True)
+            if Config is None:
+                return Finish(File, "跳过（没有配置）")
+            Config = self.WithDefaults(Config)
+            if Config.get("数据目录"):
+                DataDir = os.path.join(os.path.dirname(os.path.abspath(File)), Config["数据目录"])
+                Samples = list(self.DiscoverData(DataDir)) if os.path.isdir(DataDir) else []
+            elif Config.get("自动测试", 0) == 0:
+                Samples = []
+            if not Samples:
+                return Finish(File, "跳过（没有自动测试样例）")
+            Amount = Reserve(CompileMemoryMB)
+            try:
+                Error = self.PrepareInteractor(File, Config)
+                ResFile, Output = None, Error
+                if Error is None:
+                    ResFile, _, Output = self.Compile(File, Config, UseCache=Config.get("编译缓存", 1) != 0,
+                                                      Debug=not Config.get("交互器程序"))
+            finally:
+                Release(Amount)
+            Report = Reports[File]
+            if ResFile is None:
+                Report["compile"] = Output
+                return Finish(File, "编译失败")
+            Report["binary"] = ResFile
+            Report["samples"] = [None] * len(Samples)
+            Report["left"] = len(Samples)
+            for Index, Sample in enumerate(Samples):
+                Submit(0, lambda Cpu, Index=Index, Sample=Sample: RunJob(File, Config, ResFile, Index, Sample, Cpu))
+
+        def RunJob(File, Config, ResFile, Index, Sample, Cpu):
+            Amount = Reserve(Config["内存限制"])
+            Run = None
+            try:
+                Run = self.RunSample(ResFile, Sample, Config, Cpu)
+                Result = self.MakeResult(Run, Config)
+            except Exception as E:
+                # 评测本身出错时记为 ERR，保证该文件的剩余计数照常递减、程序照常清理
+                Result = JudgeResult(Sample['Num'], "ERR", Error=f"{type(E).__name__}: {E}")
             finally:
-                print("已清理编译生成的文件")
+                Release(Amount)
+                if Run is not None and Run.get('WorkDir'):
+                    self.CleanupTestFiles(Run['WorkDir'])
+            Report = Reports[File]
+            Report["samples"][Index] = Result.ToDict()
+            with Lock:
+                Report["left"] -= 1
+                Done = Report["left"] == 0
+            if Done:
+                del Report["left"]
+                Finish(File, "评测完成")
+
+        def WorkerLoop(Cpu):
+            while True:
+                _, _, Job = Jobs.get()
+                if Job is None:
+                    return
+                try:
+                    Job(Cpu)
+                except Exception as E:
+                    with Lock:
+                        print(f"❌ 调度任务异常: {E}")
+                finally:
+                    with Lock:
+                        Outstanding[0] -= 1
+                        Idle = Outstanding[0] == 0
+                    if Idle:
+                        for _ in range(Workers):
+                            Jobs.put((2, next(Order), None))
+
+        for File in Files:
+            Submit(1, lambda Cpu, File=File: CompileJob(File, Cpu))
+        Threads = [threading.Thread(target=WorkerLoop, args=(Cpus[I % len(Cpus)],), daemon=True)
+                   for I in range(Workers)]
+        for Thread in Threads:
+            Thread.start()
+        for Thread in Threads:
+            Thread.join()
+
+        Elapsed = time.perf_counter() - Start
+        print(f"\n📋 批量测试报告（{len(Files)} 个文件，用时 {Elapsed:.1f}s）")
+        Width = max(len(Report["file"]) for Report in Reports.values())
+        for Report in Reports.values():
+            Samples = Report["samples"]
+            if Report["status"] != "评测完成":
+                print(f"   {Report['file']:<{Width}}  {Report['status']}")
+                continue
+            Passed = sum(Sample["verdict"] == "AC" for Sample in Samples)
+            Times = [Sample["cpu_ms"] for Sample in Samples if Sample["cpu_ms"] is not None]
+            Memories = [Sample["memory_bytes"] for Sample in Samples if Sample["memory_bytes"] is not None]
+            print(f"   {Report['file']:<{Width}}  {Passed:>3}/{len(Samples):<3} "
+                  f"⏱️ {max(Times, default=0):>6.0f}ms  💾 {max(Memories, default=0)/1024/1024:>6.1f}MB  "
+                  + " ".join(Sample["verdict"] for Sample in Samples))
+            for Sample in Samples:
+                if Sample["verdict"] != "AC":
+                    Detail = "" if Sample["cpu_ms"] is None else \
+                        f"  ⏱️ {Sample['cpu_ms']:.0f}ms  💾 {Sample['memory_bytes']/1024/1024:.1f}MB"
+                    print(f"   {'':<{Width}}    样例 {Sample['num']}: {Sample['verdict']}{Detail}")
+        if ReportPath:
+            with open(ReportPath, "w", encoding="utf-8") as F:
+                json.dump(list(Reports.values()), F, ensure_ascii=False, indent=2)
+            print(f"📝 报告已写入: {ReportPath}")
+        return list(Reports.values())
+
+    def WatchChanges(self, File, Interval=0.2):
+        """生成器：File 每保存一次产出一次
+        
+        优先用 inotify 监视所在目录（兼容编辑器先写临时文件再改名的保存方式），不可用时退化为轮询修改时间"""
+        Directory = os.path.dirname(os.path.abspath(File))
+        Name = os.fsencode(os.path.basename(File))
+        Fd = -1
+        try:
+            Libc = ctypes.CDLL(None, use_errno=True)
+            Fd = Libc.inotify_init1(os.O_CLOEXEC)
+            # IN_CLOSE_WRITE | IN_MOVED_TO
+            if Fd >= 0 and Libc.inotify_add_watch(Fd, os.fsencode(Directory), 0x08 | 0x80) < 0:
+                os.close(Fd)
+                Fd = -1
+        except (OSError, AttributeError):
+            Fd = -1
+
+        if Fd < 0:
+            def Stamp():
+                try:
+                    Info = os.stat(File)
+                    return Info.st_mtime_ns, Info.st_size, Info.st_ino
+                except OSError:
+                    return None
+            Last = Stamp()
+            while True:
+                time.sleep(Interval)
+                Current = Stamp()
+                if Current is not None and Current != Last:
+                    Last = Current
+                    yield
+
+        try:
+            while True:
+                Data = os.read(Fd, 65536)
+                Changed = False
+                Offset = 0
+                # struct inotify_event { int wd; uint32 mask, cookie, len; char name[len]; }
+                while Offset + 16 <= len(Data):
+                    _, _, _, Length = struct.unpack_from("iIII", Data, Offset)
+                    if Data[Offset + 16:Offset + 16 + Length].rstrip(b"\0") == Name:
+                        Changed = True
+                    Offset += 16 + Length
+                if Changed:
+                    # 合并一次保存产生的连续事件
+                    while select.select([Fd], [], [], 0.03)[0]:
+                        os.read(Fd, 65536)
+                    yield
+        finally:
+            os.close(Fd)
+
+    def WatchRound(self, File, Workers, State, Cancel):
+        """监视模式的一轮：重新解析配置与样例，代码未变化时跳过编译，然后并行运行样例"""
+        Start = time.perf_counter()
+        print(f"\n🕒 {datetime.now().strftime('%H:%M:%S')} 检测到保存: {File}")
+        try:
+            with open(File, 'rb') as F:
+                Content = F.read()
+        except OSError as E:
+            print(f"❌ 无法读取文件: {E}")
+            return
+        Config, Samples = self.Getonfig(File)
+        if Config is None:
+            return
+        Config = self.WithDefaults(Config)
+        if Config.get("数据目录"):
+            DataDir = os.path.join(os.path.dirname(os.path.abspath(File)), Config["数据目录"])
+            if os.path.isdir(DataDir):
+                Samples = self.DiscoverData(DataDir)
+        elif Config.get("自动测试", 0) == 0 or not Samples:
+            print("⚠️ 监视模式只运行自动测试，请在配置中开启\"自动测试\"并提供样例")
+            return
+
+        Error = self.PrepareInteractor(File, Config)
+        if Error:
+            print(f"❌ {Error}")
+            return
+        Debug = not Config.get("交互器程序")
+
+        # 代码摘要：去掉最后一个注释块（配置与样例）后的源码 + 编译参数 + 本地头文件的 (修改时间, 大小)
+        Block = self.FindConfigBlock(Content)
+        Code = Content[:Block[0]] + Content[Block[1]:] if Block else Content
+        Headers = [f"{Path}:{Mtime}:{Size}".encode() for Path, Mtime, Size in (self.SourceStamp(File) or ())[1:]]
+        Digest = hashlib.sha256(b"\0".join([*(Flag.encode() for Flag in self.BuildCompileFlags(Config, Debug)),
+                                            *Headers, Code])).hexdigest()
+        ResFile = State.get('ResFile')
+        if Digest == State.get('Digest') and ResFile and os.path.exists(ResFile):
+            print("📝 仅配置/样例变化，跳过编译")
+        else:
+            ResFile, Hit, Output = self.Compile(File, Config, UseCache=Config.get("编译缓存", 1) != 0, Debug=Debug)
+            Old = State.get('ResFile')
+            if Old != ResFile:
+                self.ReleaseBinary(Old)
+            State['ResFile'] = ResFile
+            State['Digest'] = Digest if ResFile else None
+            if ResFile is None:
+                print("❌ 编译失败:")
+                if Output:
+                    print(Output)
+                return
+            print("⚡ 命中编译缓存，跳过编译" if Hit else "✅ 编译成功!")
+        if Cancel.is_set():
+            return
+
+        Workers = self.ResolveWorkers(Workers, Config)
+        PassedCount, TotalCount = self.ParallelAutoTest(ResFile, Samples, Config, Workers, Cancel)
+        if not Cancel.is_set():
+            print(f"✅ 自动测试完成：{PassedCount}/{TotalCount} 通过    "
+                  f"🕒 用时 {(time.perf_counter() - Start) * 1000:.0f}ms")
+
+    def Watch(self, File, Workers=None):
+        """监视源文件，每次保存后自动重新测试；新的保存到来时取消尚未完成的上一轮"""
+        if not os.path.exists(File):
+            print(f"❌ 文件不存在: {File}")
+            return
+        print(f"👀 正在监视: {File}（Ctrl+C 退出）")
+        State = {}
+        Round = None
+        Cancel = threading.Event()
+        try:
+            for _ in itertools.chain([None], self.WatchChanges(File)):
+                if Round is not None and Round.is_alive():
+                    Cancel.set()
+                    # 持续终止直到上一轮退出，避免取消前一刻刚启动的样例漏网
+                    while Round.is_alive():
+                        self.CancelRuns()
+                        Round.join(0.05)
+                    print("⏹️ 已取消上一轮测试")
+                Cancel = threading.Event()
+                Round = threading.Thread(target=self.WatchRound, args=(File, Workers, State, Cancel), daemon=True)
+                Round.start()
+        except KeyboardInterrupt:
+            if Round is not None and Round.is_alive():
+                Cancel.set()
+                self.CancelRuns()
+            print("\n👋 已退出监视模式")
+        finally:
+            self.ReleaseBinary(State.get('ResFile'))
+
+    def Test(self, File, Workers=None, DataDir=None, Repeat=None, Warmup=1, Pin=False, Perf=False, Rerun=False,
+             Sanitize=False, Interactor=None, InteractionLog=None, Profile=False):
+        """编译并运行测试，Perf 为真时为每个样例统计硬件性能计数器，Rerun 为真时忽略结果缓存，
+        Sanitize 为真时在后台用 ASan+UBSan 版本检查同样的样例；
+        Interactor 为交互器源文件（交互题），InteractionLog 为保存交互日志的目录；
+        Profile 为真时输出各阶段耗时（自动测试的阶段耗时与逐样例结果总会记入运行历史）"""
+        print(f"🔧 加载文件: {File}")
+        if not os.path.exists(File):
+            print(f"❌ 文件不存在: {File}")
+            return
+        Phases = {}
+        Start = time.perf_counter()
+        Config, Samples = self.Getonfig(File)
+        Phases['解析'] = time.perf_counter() - Start
+        if Config is None:
+            print("❌ 无法解析配置，自动尝试默认模式\nC++版本: C++17\n优化等级: -O2\n时间限制: 2000ms\n内存限制: 256MB")
+            Config, Samples = {"自动测试": 0}, []
+        Config = self.WithDefaults(Config)
+        if Perf:
+            Config["性能计数器"] = 1
+        if Config.get("时间校准", 0):
+            print(f"⚖️ 时间校准: 本机速度系数 {self.SpeedFactor():.2f}，实际限制 "
+                  f"{math.ceil(Config['时间限制'] * self.SpeedFactor())}ms，时间按参考机器换算")
+
+        # 外部数据目录：命令行参数相对当前目录，配置中的"数据目录"相对源文件所在目录
+        if DataDir is None and Config.get("数据目录"):
+            DataDir = os.path.join(os.path.dirname(os.path.abspath(File)), Config["数据目录"])
+        AutoMode = Config.get("自动测试", 0) != 0 and len(Samples) > 0
+        if DataDir is not None:
+            if not os.path.isdir(DataDir):
+                print(f"❌ 数据目录不存在: {DataDir}")
+                return
+            Samples = self.DiscoverData(DataDir)
+            First = next(Samples, None)
+            if First is None:
+                print(f"⚠️ 数据目录中没有 *.in 与 *.ans/*.out 配对的测试点: {DataDir}")
+                return
+            Samples = itertools.chain([First], Samples)
+            AutoMode = True
+            print(f"📂 使用数据目录: {DataDir}")
+
+        Error = self.PrepareInteractor(File, Config, Interactor)
+        if Error:
+            print(f"❌ {Error}")
             return
+        if Config.get("交互器程序"):
+            if not AutoMode or Repeat:
+                print("⚠️ 交互题只支持自动测试（不支持手动测试与基准测试）")
+                return
+            if InteractionLog:
+                Config["交互日志"] = os.path.abspath(InteractionLog)
+            print(f"🔁 交互模式: 交互器 {Interactor or Config['交互器']}")
 
-        print("✅ 编译成功!")
+        # 消毒检查与正式版本同时编译，样例在后台检查，不影响正式判定的输出
+        Collect = None
+        if AutoMode and (Sanitize or Config.get("消毒检查", 0)) and not Repeat and not Config.get("交互器程序"):
+            Samples = list(Samples)
+            Cpus = len(os.sched_getaffinity(0))
+            Collect = self.MemorySafetyCheck(File, Samples, Config, max(1, Cpus - (Workers or 1)))
+
+        print(f"🔧 编译文件: {File}")
+        # 交互题通过标准输入输出与交互器通信，不定义 DEBUG（避免模板中的 freopen）
+        Start = time.perf_counter()
+        ResFile, Hit, Output = self.Compile(File, Config, UseCache=Config.get("编译缓存", 1) != 0,
+                                            Debug=not Config.get("交互器程序"))
+        Phases['编译'] = time.perf_counter() - Start
+        if ResFile is None:
+            print("❌ 编译失败:")
+            if Output:
+                print(Output)
+            return
+
+        if Hit:
+            print("⚡ 命中编译缓存，跳过编译")
+        else:
+            print("✅ 编译成功!")
 
         # 判断测试模式
-        if Config.get("自动测试", 0) == 0 or len(Samples) == 0:
+        if not AutoMode:
             # 手动测试模式
             print("🔄 开始手动样例测试")
             TestNum = 1
@@ -561,18 +3716,38 @@ signed main() {{
                     break
         else:
             # 自动测试模式
-            print("🔄 开始自动样例测试\n")
-            PassedCount = 0
-            TotalSamples = len(Samples)
-            for S in Samples:
-                if self.AutoTest(ResFile, S, Config):
-                    PassedCount += 1
+            Workers = self.ResolveWorkers(Workers, Config)
+            if Repeat:
+                print(f"🔄 开始基准测试（每个样例预热 {Warmup} 次，测量 {Repeat} 次）\n")
+                PassedCount, TotalSamples = self.BenchmarkTest(File, ResFile, Samples, Config, Repeat, Warmup, Pin)
+            elif Workers > 1:
+                print(f"🔄 开始自动样例测试（{Workers} 路并行）\n")
+            else:
+                print("🔄 开始自动样例测试\n")
+            if not Repeat:
+                Runs = []
+                Cached = []
+                Start = time.perf_counter()
+                if Config.get("结果缓存", 1) != 0 and not Perf:
+                    PassedCount, TotalSamples = self.CachedAutoTest(File, ResFile, Samples, Config, Workers, Rerun,
+                                                                    OnResult=Runs.append, OnCached=Cached.append)
+                else:
+                    PassedCount, TotalSamples = self.ParallelAutoTest(ResFile, Samples, Config, Workers,
+                                                                      OnResult=Runs.append)
+                Phases['测试'] = time.perf_counter() - Start
+                SamplePhases = {}
+                for Run in Runs:
+                    for Name, Value in Run['Phases'].items():
+                        SamplePhases[Name] = SamplePhases.get(Name, 0) + Value
+                if Profile:
+                    self.ShowPhases(Phases, SamplePhases)
+                if (Runs or Cached) and Config.get("运行历史", 1) != 0:
+                    self.RecordHistory(File, ResFile, dict(Phases, **{f"样例{Name}": Value for Name, Value
+                                                                      in SamplePhases.items()}), Runs, Config, Cached)
             print(f"✅ 自动测试完成：{PassedCount}/{TotalSamples} 通过")
-        try:
-            os.remove(ResFile)
-        except Exception as e:
-            pass
-        finally:
+            if Collect is not None:
+                self.ShowSanitizerReport(*Collect())
+        if self.ReleaseBinary(ResFile):
             print("已清理编译生成的文件")
         return
 
@@ -580,18 +3755,148 @@ def main():
     if len(sys.argv) < 2:
         print("用法:")
         print("  python3 OITools.py Template [文件路径]    # 生成模板")
-        print("  python3 OITools.py Test [文件路径]        # 运行测试")
+        print("  python3 OITools.py Test [文件路径] [-j 并行数] [-d 数据目录] [-r 次数]    # 运行测试")
+        print("  python3 OITools.py Stress [待测] [暴力] [生成器] [-n 轮数] [-j 并行数] [-s 种子]    # 对拍")
+        print("  python3 OITools.py Batch [目录] [-j 并行数] [-m 内存预算MB] [-o 报告.json]    # 批量测试目录下的全部源文件")
+        print("  python3 OITools.py Minimize [待测] [输入] [--brute 暴力] [-j 并行数] [-o 输出]    # 缩小失败的输入")
+        print("  python3 OITools.py Watch [文件路径] [-j 并行数]    # 监视文件，保存后自动测试")
+        print("  python3 OITools.py Complexity [待测] [生成器] [--min 规模] [--max 规模] [--target 最大规模]    # 复杂度估计")
+        print("  python3 OITools.py Run [文件路径] [-i 输入文件]    # 编译并以给定输入运行一次")
+        print("  python3 OITools.py Cache [--clear]        # 查看/清空编译缓存")
+        print("  python3 OITools.py Calibrate [--save-reference]    # 重新校准本机速度并显示系数")
+        print("  python3 OITools.py Report [文件路径] [--threshold 百分比]    # 查看运行历史与性能回归")
+        print("  python3 OITools.py Daemon [--socket 路径]    # 启动常驻评测守护进程")
+        print("  python3 OITools.py Client [命令] [参数...]    # 通过守护进程执行命令，如 Client Test a.cpp")
         return
 
     Obj = OItools()
-    Command = sys.argv[1]
+    if sys.argv[1] == "Client":
+        sys.exit(Obj.Client(sys.argv[2:]))
+    Dispatch(Obj, sys.argv[1:])
+
+
+def Dispatch(Obj, Argv):
+    """执行一条命令（Argv 不含程序名），命令行与守护进程共用"""
+    Command = Argv[0]
 
     if Command == "Template":
-        FilePath = sys.argv[2]
+        FilePath = Argv[1]
         Obj.ApplyTemplate(FilePath)
     elif Command == "Test":
-        FilePath = sys.argv[2]
-        Obj.Test(FilePath)
+        Parser = argparse.ArgumentParser(prog="OITools.py Test", description="编译并运行测试")
+        Parser.add_argument("File", help="源文件路径")
+        Parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="并行测试的样例数，0表示使用全部CPU（默认读取配置中的\"并行测试\"）")
+        Parser.add_argument("-d", "--data", default=None,
+                            help="外部测试数据目录，包含 *.in 与 *.ans/*.out（默认读取配置中的\"数据目录\"）")
+        Parser.add_argument("-r", "--repeat", type=int, default=None,
+                            help="基准测试：每个样例重复测量的次数（串行运行，以CPU时间中位数判定）")
+        Parser.add_argument("--warmup", type=int, default=1, help="基准测试的预热次数")
+        Parser.add_argument("--pin", action="store_true", help="基准测试时绑定到单个CPU")
+        Parser.add_argument("--perf", action="store_true",
+                            help="统计每个样例的硬件性能计数器（指令/周期/缓存未命中/分支未命中）与缺页、上下文切换")
+        Parser.add_argument("--rerun", action="store_true", help="忽略结果缓存，重新运行全部样例")
+        Parser.add_argument("--sanitize", action="store_true",
+                            help="同时编译 ASan+UBSan 版本，在后台检查同样的样例并附上发现的问题")
+        Parser.add_argument("--interactor", default=None,
+                            help="交互器源文件，交互题中与程序通过管道通信（默认读取配置中的\"交互器\"）")
+        Parser.add_argument("--log-interaction", default=None, metavar="DIR",
+                            help="把每个样例双方的全部通信记录到该目录下的 <样例>.log（经过转发，略慢）")
+        Parser.add_argument("--jsonl", action="store_true",
+                            help="只输出评测记录：每个样例一行JSON（编译失败时输出一条 CE 记录、文件缺失时输出一条 ERR 记录，并以非零状态退出），供脚本与CI使用")
+        Parser.add_argument("--profile", action="store_true",
+                            help="输出各阶段耗时：解析、编译、测试，以及样例累计的准备、启动、运行、比较")
+        Args = Parser.parse_args(Argv[1:])
+        if Args.jsonl:
+            Failed = False
+            for Result in Obj.Judge(Args.File, Workers=Args.jobs, DataDir=Args.data, Interactor=Args.interactor):
+                print(json.dumps(Result.ToDict(), ensure_ascii=False), flush=True)
+                # 编号为空的记录表示评测未能进行（文件缺失、编译失败）
+                Failed = Failed or Result.Num is None
+            if Failed:
+                sys.exit(1)
+            return
+        Obj.Test(Args.File, Workers=Args.jobs, DataDir=Args.data, Repeat=Args.repeat, Warmup=Args.warmup,
+                 Pin=Args.pin, Perf=Args.perf, Rerun=Args.rerun, Sanitize=Args.sanitize,
+                 Interactor=Args.interactor, InteractionLog=Args.log_interaction, Profile=Args.profile)
+    elif Command == "Stress":
+        Parser = argparse.ArgumentParser(prog="OITools.py Stress", description="对拍：生成器 → 暴力程序 → 待测程序 → 比较")
+        Parser.add_argument("File", help="待测程序源文件（读取其中的配置）")
+        Parser.add_argument("Brute", help="暴力程序源文件")
+        Parser.add_argument("Gen", help="数据生成器源文件，以种子作为第一个命令行参数，数据输出到标准输出")
+        Parser.add_argument("-n", "--iterations", type=int, default=1000, help="最多运行的轮数")
+        Parser.add_argument("-j", "--jobs", type=int, default=None, help="并行数，0表示使用全部CPU（默认读取配置中的\"并行测试\"）")
+        Parser.add_argument("-s", "--seed", type=int, default=1, help="起始种子")
+        Args = Parser.parse_args(Argv[1:])
+        Obj.Stress(Args.File, Args.Brute, Args.Gen, Args.iterations, Args.jobs, Args.seed)
+    elif Command == "Batch":
+        Parser = argparse.ArgumentParser(prog="OITools.py Batch", description="批量测试目录下的全部 .cpp 源文件")
+        Parser.add_argument("Directory", help="比赛目录，递归查找 .cpp 源文件")
+        Parser.add_argument("-j", "--jobs", type=int, default=None, help="调度器的并行数（默认全部CPU）")
+        Parser.add_argument("-m", "--memory", type=int, default=None,
+                            help="所有并行任务共享的内存预算（MB，默认为可用内存的80%%）")
+        Parser.add_argument("-o", "--output", default=None, help="把逐文件、逐样例的结果写入JSON报告")
+        Args = Parser.parse_args(Argv[1:])
+        Obj.Batch(Args.Directory, Args.jobs, Args.memory, Args.output)
+    elif Command == "Minimize":
+        Parser = argparse.ArgumentParser(prog="OITools.py Minimize", description="以 delta debugging 缩小失败的输入，保持判定类别不变")
+        Parser.add_argument("File", help="待测程序源文件（读取其中的配置）")
+        Parser.add_argument("Input", help="失败的输入文件")
+        Parser.add_argument("--brute", default=None, help="暴力程序源文件，为每个候选输入生成答案（缩小答案错误时必需）")
+        Parser.add_argument("--ans", default=None, help="原始输入的答案文件（没有暴力程序时用于判定原始输入）")
+        Parser.add_argument("-j", "--jobs", type=int, default=None, help="并行数（默认全部CPU）")
+        Parser.add_argument("-o", "--output", default=None, help="最小输入的保存路径（默认 <输入>.min.in）")
+        Args = Parser.parse_args(Argv[1:])
+        Obj.Minimize(Args.File, Args.Input, Args.brute, Args.ans, Args.jobs, Args.output)
+    elif Command == "Watch":
+        Parser = argparse.ArgumentParser(prog="OITools.py Watch", description="监视源文件，保存后自动重新测试")
+        Parser.add_argument("File", help="源文件路径")
+        Parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="并行测试的样例数，0表示使用全部CPU（默认读取配置中的\"并行测试\"）")
+        Args = Parser.parse_args(Argv[1:])
+        Obj.Watch(Args.File, Args.jobs)
+    elif Command == "Complexity":
+        Parser = argparse.ArgumentParser(prog="OITools.py Complexity", description="在不同规模上测量并估计时间/内存复杂度")
+        Parser.add_argument("File", help="待测程序源文件（读取其中的配置）")
+        Parser.add_argument("Gen", help="数据生成器源文件，以 规模 种子 作为命令行参数，数据输出到标准输出")
+        Parser.add_argument("--min", type=int, default=1000, help="最小规模")
+        Parser.add_argument("--max", type=int, default=1000000, help="最大测量规模")
+        Parser.add_argument("--steps", type=int, default=8, help="测量的规模个数（几何级数）")
+        Parser.add_argument("-r", "--repeat", type=int, default=3, help="每个规模的测量次数，取中位数")
+        Parser.add_argument("--target", type=int, default=None, help="外推的题目最大规模（默认读取配置中的\"最大规模\"）")
+        Parser.add_argument("--pin", action="store_true", help="绑定到单个CPU测量")
+        Args = Parser.parse_args(Argv[1:])
+        Obj.Complexity(Args.File, Args.Gen, Args.min, Args.max, Args.steps, Args.repeat, Args.target, Args.pin)
+    elif Command == "Run":
+        Parser = argparse.ArgumentParser(prog="OITools.py Run", description="编译并以给定输入运行一次，输出程序结果")
+        Parser.add_argument("File", help="源文件路径")
+        Parser.add_argument("-i", "--input", default=None, help="输入文件（默认读取标准输入）")
+        Args = Parser.parse_args(Argv[1:])
+        Obj.RunOnce(Args.File, Args.input)
+    elif Command == "Daemon":
+        Parser = argparse.ArgumentParser(prog="OITools.py Daemon", description="常驻评测守护进程，通过Unix套接字接收命令")
+        Parser.add_argument("--socket", default=None, help="套接字路径（默认 $OITOOLS_SOCKET 或缓存目录下的 daemon.sock）")
+        Args = Parser.parse_args(Argv[1:])
+        Obj.Daemon(Args.socket)
+    elif Command == "Cache":
+        Parser = argparse.ArgumentParser(prog="OITools.py Cache", description="查看或清空编译缓存")
+        Parser.add_argument("--clear", action="store_true", help="清空编译缓存")
+        Args = Parser.parse_args(Argv[1:])
+        Obj.CacheInfo(Clear=Args.clear)
+    elif Command == "Report":
+        Parser = argparse.ArgumentParser(prog="OITools.py Report", description="查看运行历史，标出同一份代码相邻版本间的性能回归")
+        Parser.add_argument("File", help="源文件路径")
+        Parser.add_argument("-n", "--revisions", type=int, default=10, help="显示最近的版本数")
+        Parser.add_argument("--threshold", type=float, default=10.0, help="判定为回归的增幅（百分比）")
+        Parser.add_argument("--min-ms", type=float, default=2.0, help="时间变化的噪声下限（ms）")
+        Args = Parser.parse_args(Argv[1:])
+        Obj.Report(Args.File, Args.revisions, Args.threshold, Args.min_ms)
+    elif Command == "Calibrate":
+        Parser = argparse.ArgumentParser(prog="OITools.py Calibrate", description="运行参考基准，计算本机相对参考机器的速度系数")
+        Parser.add_argument("--save-reference", action="store_true",
+                            help="把本机记为参考机器（在评测机或与其速度相当的机器上执行）")
+        Args = Parser.parse_args(Argv[1:])
+        Obj.Calibrate(SaveReference=Args.save_reference)
     else:
         print(f"❌ 未知命令: {Command}")
 